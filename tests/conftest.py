@@ -37,3 +37,14 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def synchronous_background_work(settings):
+    # Фоновые потоки могли бы писать во временный MEDIA_ROOT, который
+    # тест уже удаляет: миниатюры создаются сразу, очередь комментариев
+    # без фонового потока
+    settings.THUMBNAIL_WORKERS = 0
+    settings.COMMENT_BUFFER_WORKER = False
@@ -0,0 +1,288 @@
+"""Двухуровневый кеш: LRU в памяти процесса поверх общего бэкенда.
+
+Локальный уровень хранит ограниченное число ключей с коротким TTL и
+снимает с общего бэкенда горячие чтения. Каждая запись и удаление
+попадают в журнал инвалидаций в общем бэкенде; остальные процессы
+читают журнал не чаще раза в SYNC_INTERVAL секунд и выбрасывают
+изменённые ключи из своих локальных копий.
+
+Журнал — кольцо из LOG_SIZE ключей со сроком жизни LOG_TIMEOUT, чтобы
+он не вытеснял из общего бэкенда настоящие записи. Процесс, который
+отстал от журнала больше чем на кольцо или на срок жизни записей,
+просто очищает свой локальный уровень.
+
+Номер журнала, блокировки от «давки» и счётчики приложения опираются
+на атомарные add и incr общего бэкенда, поэтому бэкенды с incr из
+BaseCache (чтение и запись без блокировки: FileBasedCache,
+DatabaseCache) в качестве общего не принимаются. Для нескольких
+процессов нужен memcached или redis; LocMemCache атомарен только
+внутри одного процесса.
+"""
+import math
+import pickle
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.functional import cached_property
+
+LOG_SEQUENCE_KEY = 'two-tier:log-seq'
+LOG_ENTRY_KEY = 'two-tier:log:{}'
+CLEAR_MARKER = '*'
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED', 'shared')
+        self._local_max_entries = options.get('LOCAL_MAX_ENTRIES', 1000)
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self._sync_interval = options.get('SYNC_INTERVAL', 1)
+        self._log_size = options.get('LOG_SIZE', 10000)
+        # Записи старше локального TTL и интервала синхронизации уже
+        # никому не нужны: отставший процесс очистит локальный уровень
+        self._log_timeout = options.get('LOG_TIMEOUT', math.ceil(
+            2 * max(self._local_timeout, self._sync_interval, 1)))
+        self._local = OrderedDict()
+        self._lock = threading.RLock()
+        self._seen_sequence = None
+        self._synced_at = 0
+        self.stats = Counter()
+
+    @cached_property
+    def shared(self):
+        shared = caches[self._shared_alias]
+        if type(shared).incr is BaseCache.incr:
+            raise ImproperlyConfigured(
+                f'Общий кеш {self._shared_alias!r} '
+                f'({type(shared).__name__}) не умеет атомарно incr; '
+                f'нужен memcached, redis или LocMemCache.')
+        return shared
+
+    # Локальный уровень
+
+    def _local_get(self, key):
+        with self._lock:
+            item = self._local.get(key)
+            if item is None:
+                return None
+            expires_at, pickled = item
+            if expires_at < time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return item
+
+    def _local_set(self, key, value, timeout=None):
+        ttl = self._local_timeout
+        if timeout is not None:
+            ttl = min(ttl, timeout)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._local[key] = (
+                time.monotonic() + ttl,
+                pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+            )
+            self._local.move_to_end(key)
+            while len(self._local) > self._local_max_entries:
+                self._local.popitem(last=False)
+
+    def _local_discard(self, keys):
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+
+    def _local_clear(self):
+        with self._lock:
+            self._local.clear()
+
+    # Журнал инвалидаций
+
+    def _log_key(self, sequence):
+        return LOG_ENTRY_KEY.format(sequence % self._log_size)
+
+    def _next_sequence(self, count):
+        try:
+            return self.shared.incr(LOG_SEQUENCE_KEY, count)
+        except ValueError:
+            # Журнал начинается с отметки времени: если ключ номера
+            # вытеснен, новые номера не повторяют уже прочитанные
+            self.shared.add(LOG_SEQUENCE_KEY, int(time.time() * 1000), None)
+            return self.shared.incr(LOG_SEQUENCE_KEY, count)
+
+    def _broadcast(self, keys):
+        keys = list(keys)
+        last = self._next_sequence(len(keys))
+        first = last - len(keys) + 1
+        # В ячейке кольца хранится и номер записи: так видно, что её
+        # уже перезаписали
+        self.shared.set_many(
+            {
+                self._log_key(sequence): (sequence, key)
+                for sequence, key in zip(range(first, last + 1), keys)
+            },
+            self._log_timeout,
+        )
+        with self._lock:
+            # Свои записи уже применены к локальному уровню
+            if self._seen_sequence == first - 1:
+                self._seen_sequence = last
+
+    def _read_log(self, seen, current):
+        """Ключи из записей журнала после `seen` или None, если часть
+        записей потеряна или среди них есть очистка кеша."""
+        if current - seen > self._log_size:
+            return None
+        sequences = range(seen + 1, current + 1)
+        entries = self.shared.get_many(
+            [self._log_key(sequence) for sequence in sequences])
+        keys = []
+        for sequence in sequences:
+            entry = entries.get(self._log_key(sequence))
+            if entry is None or entry[0] != sequence:
+                return None
+            keys.append(entry[1])
+        if CLEAR_MARKER in keys:
+            return None
+        return keys
+
+    def sync(self, force=False):
+        """Применяет чужие инвалидации из журнала общего бэкенда."""
+        now = time.monotonic()
+        if not force and now - self._synced_at < self._sync_interval:
+            return
+        self._synced_at = now
+        current = self.shared.get(LOG_SEQUENCE_KEY)
+        with self._lock:
+            seen = self._seen_sequence
+            self._seen_sequence = current
+        if seen is None or current == seen:
+            return
+        keys = None
+        if current is not None and current > seen:
+            keys = self._read_log(seen, current)
+        if keys is None:
+            # Журнал сброшен вместе с общим кешем или записи потеряны
+            self._local_clear()
+            return
+        self.stats['invalidations'] += len(keys)
+        self._local_discard(keys)
+
+    # API кеша
+
+    def get(self, key, default=None, version=None):
+        self.sync()
+        local_key = self.make_key(key, version)
+        item = self._local_get(local_key)
+        if item is not None:
+            self.stats['local_hits'] += 1
+            return pickle.loads(item[1])
+        self.stats['local_misses'] += 1
+        value = self.shared.get(key, self, version=version)
+        if value is self:
+            self.stats['shared_misses'] += 1
+            return default
+        self.stats['shared_hits'] += 1
+        self._local_set(local_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        self.sync()
+        found = {}
+        missing = []
+        for key in keys:
+            item = self._local_get(self.make_key(key, version))
+            if item is None:
+                missing.append(key)
+            else:
+                found[key] = pickle.loads(item[1])
+        self.stats['local_hits'] += len(found)
+        self.stats['local_misses'] += len(missing)
+        if missing:
+            shared = self.shared.get_many(missing, version=version)
+            self.stats['shared_hits'] += len(shared)
+            self.stats['shared_misses'] += len(missing) - len(shared)
+            for key, value in shared.items():
+                self._local_set(self.make_key(key, version), value)
+            found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._shared_timeout(timeout)
+        self.shared.set(key, value, timeout, version=version)
+        local_key = self.make_key(key, version)
+        self._local_set(local_key, value, timeout)
+        self._broadcast([local_key])
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._shared_timeout(timeout)
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            local_key = self.make_key(key, version)
+            self._local_set(local_key, value, timeout)
+            self._broadcast([local_key])
+        return added
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._shared_timeout(timeout)
+        failed = self.shared.set_many(data, timeout, version=version)
+        local_keys = []
+        for key, value in data.items():
+            local_key = self.make_key(key, version)
+            local_keys.append(local_key)
+            if key not in failed:
+                self._local_set(local_key, value, timeout)
+        if local_keys:
+            self._broadcast(local_keys)
+        return failed
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        self.shared.delete_many(keys, version=version)
+        local_keys = [self.make_key(key, version) for key in keys]
+        self._local_discard(local_keys)
+        if local_keys:
+            self._broadcast(local_keys)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version=version)
+        local_key = self.make_key(key, version)
+        self._local_discard([local_key])
+        self._broadcast([local_key])
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._shared_timeout(timeout)
+        return self.shared.touch(key, timeout, version=version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, self, version=version) is not self
+
+    def clear(self):
+        # Номер журнала переживает очистку, чтобы отметка о ней дошла
+        # до остальных процессов
+        sequence = self.shared.get(LOG_SEQUENCE_KEY)
+        self.shared.clear()
+        if sequence is not None:
+            self.shared.add(LOG_SEQUENCE_KEY, sequence, None)
+        self._local_clear()
+        self._broadcast([CLEAR_MARKER])
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
+
+    def _shared_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            return self.default_timeout
+        return timeout
+
+    def get_stats(self):
+        """Попадания и промахи по уровням кеша."""
+        return dict(self.stats)
@@ -0,0 +1,53 @@
+"""Хранилище файлов с адресацией по содержимому.
+
+Имя файла — SHA-256 его содержимого: одинаковые загрузки ложатся в
+один файл, а sorl-thumbnail, у которого имя миниатюры зависит от имени
+исходника, создаёт для них одни и те же миниатюры.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+CONTENT_NAME = re.compile(r'(?:^|/)([0-9a-f]{2})/\1[0-9a-f]{62}(\.[^/]*)?$')
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def content_name(self, name, content):
+        """Имя по содержимому в каталоге `name`:
+        `posts/ab/abcdef….gif`."""
+        digest = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        directory = posixpath.dirname(name)
+        extension = posixpath.splitext(name)[1].lower()
+        hexdigest = digest.hexdigest()
+        return posixpath.join(
+            directory, hexdigest[:2], hexdigest + extension)
+
+    def is_content_name(self, name):
+        return CONTENT_NAME.search(name) is not None
+
+    def get_available_name(self, name, max_length=None):
+        # Одно имя — одно содержимое, подбирать свободное имя не нужно
+        return name
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        if self.exists(name):
+            return name
+        # Пишем под временным именем и переименовываем: читатели не видят
+        # недописанный файл, а параллельная загрузка того же содержимого
+        # просто заменит файл идентичным
+        temporary = super()._save(f'{name}.{uuid.uuid4().hex}.tmp', content)
+        os.replace(self.path(temporary), self.path(name))
+        return name
@@ -0,0 +1,241 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from core.cache import TwoTierCache
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SHARED_CACHE = {
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'two-tier-tests',
+    },
+}
+
+
+@override_settings(CACHES=SHARED_CACHE)
+class TwoTierCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        # Два «воркера» со своими локальными уровнями и общим бэкендом
+        self.worker_1 = self.make_worker()
+        self.worker_2 = self.make_worker()
+
+    def make_worker(self, **options):
+        return TwoTierCache('', {'OPTIONS': {
+            'SHARED': 'shared', 'SYNC_INTERVAL': 60, **options}})
+
+    def test_second_read_is_served_locally(self):
+        """Повторное чтение обслуживается локальным уровнем."""
+        self.worker_1.set('key', 'value')
+        self.assertEqual(self.worker_2.get('key'), 'value')
+        self.assertEqual(self.worker_2.get('key'), 'value')
+        self.assertEqual(self.worker_2.get('missing'), None)
+        self.assertEqual(self.worker_2.get_stats(), {
+            'local_hits': 1,
+            'local_misses': 2,
+            'shared_hits': 1,
+            'shared_misses': 1,
+        })
+
+    def test_invalidation_reaches_other_workers(self):
+        """Запись и удаление в одном воркере видны в другом
+        после синхронизации с журналом."""
+        self.worker_1.set('key', 'old')
+        self.worker_2.get('key')
+
+        self.worker_1.set('key', 'new')
+        self.assertEqual(self.worker_2.get('key'), 'old')
+        self.worker_2.sync(force=True)
+        self.assertEqual(self.worker_2.get('key'), 'new')
+
+        self.worker_1.add('counter', 1)
+        self.worker_2.get('counter')
+        self.worker_1.incr('counter')
+        self.worker_1.delete('key')
+        self.worker_2.sync(force=True)
+        self.assertEqual(self.worker_2.get('counter'), 2)
+        self.assertIsNone(self.worker_2.get('key'))
+
+    def test_clear_reaches_other_workers(self):
+        """Очистка кеша сбрасывает локальные уровни всех воркеров."""
+        self.worker_1.set('key', 'value')
+        self.worker_2.get('key')
+        self.worker_1.clear()
+        self.worker_2.sync(force=True)
+        self.assertIsNone(self.worker_2.get('key'))
+
+    def test_log_is_a_bounded_expiring_ring(self):
+        """Журнал занимает не больше LOG_SIZE ключей общего бэкенда с
+        конечным сроком жизни и не вытесняет вечные ключи."""
+        shared = caches['shared']
+        worker = self.make_worker(LOG_SIZE=50, LOG_TIMEOUT=10)
+        worker.set('version', 1, None)
+        # Вместе с журналом 200 записей помещаются в MAX_ENTRIES=300
+        for i in range(200):
+            worker.set(f'key-{i}', i)
+        log_keys = [key for key in shared._cache if 'two-tier:log:' in key]
+        self.assertLessEqual(len(log_keys), 50)
+        self.assertTrue(all(
+            shared._expire_info[key] is not None for key in log_keys))
+        self.assertEqual(shared.get('version'), 1)
+
+    def test_worker_behind_the_ring_clears_local_tier(self):
+        """Процесс, отставший больше чем на кольцо журнала, очищает
+        локальный уровень, а не читает перезаписанные ячейки."""
+        worker_1 = self.make_worker(LOG_SIZE=5)
+        worker_2 = self.make_worker(LOG_SIZE=5)
+        worker_1.set('key', 'old')
+        worker_2.get('key')
+        worker_2.sync(force=True)
+        worker_1.set('key', 'new')
+        worker_1.set_many({f'other-{i}': i for i in range(3)})
+        worker_2.sync(force=True)
+        self.assertEqual(worker_2.get('key'), 'new')
+
+        worker_1.set('key', 'newest')
+        worker_1.set_many({f'other-{i}': i for i in range(10)})
+        worker_2.sync(force=True)
+        self.assertEqual(len(worker_2._local), 0)
+        self.assertEqual(worker_2.get('key'), 'newest')
+
+    @override_settings(CACHES={**SHARED_CACHE, 'files': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(TEMP_MEDIA_ROOT, 'cache'),
+    }})
+    def test_shared_backend_must_be_atomic(self):
+        """Общий кеш без атомарного incr не принимается."""
+        worker = self.make_worker(SHARED='files')
+        with self.assertRaises(ImproperlyConfigured):
+            worker.set('version', 1)
+
+    def test_local_tier_is_bounded(self):
+        """Локальный уровень вытесняет давно неиспользованные ключи."""
+        worker = self.make_worker(LOCAL_MAX_ENTRIES=2)
+        worker.set_many({'a': 1, 'b': 2})
+        worker.get('a')
+        worker.set('c', 3)
+        self.assertEqual(len(worker._local), 2)
+        worker.get_many(['a', 'b', 'c'])
+        self.assertEqual(worker.get_stats()['shared_hits'], 1)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, MEDIA_SENDFILE=None)
+class MediaViewTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'posts'), exist_ok=True)
+        cls.content = bytes(range(256)) * 4
+        digest = hashlib.sha256(cls.content).hexdigest()
+        cls.immutable = f'posts/{digest[:2]}/{digest}.gif'
+        for name in ('posts/legacy.gif', cls.immutable):
+            path = os.path.join(TEMP_MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(cls.content)
+        cls.url = '/media/posts/legacy.gif'
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_full_response_has_validators(self):
+        """Файл отдаётся с ETag, Last-Modified и Accept-Ranges."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Type'], 'image/gif')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+
+    def test_conditional_get(self):
+        """If-None-Match и If-Modified-Since дают 304."""
+        response = self.client.get(self.url)
+        conditions = (
+            {'HTTP_IF_NONE_MATCH': response['ETag']},
+            {'HTTP_IF_MODIFIED_SINCE': response['Last-Modified']},
+        )
+        for headers in conditions:
+            with self.subTest(headers=headers):
+                self.assertEqual(
+                    self.client.get(self.url, **headers).status_code, 304)
+
+    def test_range_requests(self):
+        """Range отдаёт часть файла, неудовлетворимый — 416."""
+        ranges = {
+            'bytes=2-5': (2, 5),
+            'bytes=1020-': (1020, 1023),
+            'bytes=-4': (1020, 1023),
+            'bytes=1000-5000': (1000, 1023),
+        }
+        for header, (start, end) in ranges.items():
+            with self.subTest(range=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(
+                    b''.join(response.streaming_content),
+                    self.content[start:end + 1])
+                self.assertEqual(
+                    response['Content-Range'], f'bytes {start}-{end}/1024')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+        # Файл изменился после If-Range — отдаётся целиком
+        response = self.client.get(
+            self.url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"other"')
+        self.assertEqual(response.status_code, 200)
+
+        # Слабый валидатор в If-Range не подходит даже при совпадении
+        etag = self.client.get(self.url)['ETag']
+        for if_range, status in ((etag, 206), ('W/' + etag, 200)):
+            with self.subTest(if_range=if_range):
+                response = self.client.get(
+                    self.url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE=if_range)
+                self.assertEqual(response.status_code, status)
+
+    def test_range_of_empty_file(self):
+        """Любой диапазон пустого файла неудовлетворим."""
+        path = os.path.join(TEMP_MEDIA_ROOT, 'posts', 'empty.gif')
+        open(path, 'wb').close()
+        for header in ('bytes=-4', 'bytes=0-'):
+            with self.subTest(range=header):
+                response = self.client.get(
+                    '/media/posts/empty.gif', HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], 'bytes */0')
+
+    def test_immutable_names_cached_forever(self):
+        """Имена по хешу содержимого кешируются навсегда."""
+        response = self.client.get('/media/' + self.immutable)
+        self.assertEqual(
+            response['Cache-Control'], 'public, max-age=31536000, immutable')
+
+    def test_missing_and_outside_files(self):
+        """Несуществующие файлы, каталоги и пути за MEDIA_ROOT — 404."""
+        for url in ('/media/posts/missing.gif', '/media/posts/',
+                    '/media/../yatube/settings.py',
+                    '/media/%2e%2e/manage.py'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    @override_settings(MEDIA_SENDFILE='x-accel-redirect')
+    def test_offload_to_web_server(self):
+        """С X-Accel-Redirect Django отдаёт только заголовки."""
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/posts/legacy.gif')
+        self.assertEqual(response.content, b'')
+        self.assertIn('ETag', response)
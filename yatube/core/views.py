@@ -1,4 +1,23 @@
+import mimetypes
+import os
+import re
+import stat as statmod
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (FileResponse, Http404, HttpResponse,
+                         StreamingHttpResponse)
 from django.shortcuts import render
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+from sorl.thumbnail.conf import settings as thumbnail_settings
+
+from core.storage import CONTENT_NAME
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
 
 
 def page_not_found(request, exception):
@@ -7,3 +26,143 @@ def page_not_found(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def is_immutable(path):
+    """Имена, которые никогда не меняют содержимое: картинки постов по
+    хешу содержимого и миниатюры sorl (их имя — хеш исходника и опций)."""
+    return (
+        CONTENT_NAME.search(path) is not None
+        or path.startswith(thumbnail_settings.THUMBNAIL_PREFIX)
+    )
+
+
+def parse_range(header, size):
+    """Границы одного диапазона `bytes=` или None, если заголовок
+    не разобрать или диапазонов несколько (тогда отдаётся весь файл).
+    Для неудовлетворимого диапазона возвращает (size, size)."""
+    match = RANGE_RE.match(header)
+    if not match:
+        return None
+    start, end = match.groups()
+    if size == 0:
+        # В пустом файле нет ни одного байта, в том числе для bytes=-N
+        return (size, size)
+    if not start:
+        if not end or int(end) == 0:
+            return (size, size)
+        return (max(size - int(end), 0), size - 1)
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return (size, size)
+    return (start, end)
+
+
+def range_applies(request, etag, last_modified):
+    """If-Range: диапазон отдаётся, только если файл не изменился."""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('W/'):
+        # If-Range требует сильного сравнения (RFC 7233, 3.2): со слабым
+        # валидатором Range игнорируется
+        return False
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(last_modified)
+
+
+def file_range(file, start, length, chunk_size=FileResponse.block_size):
+    with file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def offload(response, path, full_path):
+    """Передаёт отдачу файла веб-серверу (X-Sendfile или
+    X-Accel-Redirect), Django отдаёт только заголовки."""
+    if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = (
+            settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(path))
+    else:
+        response['X-Sendfile'] = full_path
+    return response
+
+
+def media_stat(path):
+    """Полный путь и stat файла из MEDIA_ROOT; иначе 404."""
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404
+    if not statmod.S_ISREG(stat.st_mode):
+        raise Http404
+    return full_path, stat
+
+
+def media_body(request, path, full_path, size, etag, last_modified):
+    """Ответ с телом: весь файл, диапазон, 416 или передача
+    веб-серверу."""
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+    if settings.MEDIA_SENDFILE is not None:
+        # Диапазоны веб-сервер обработает сам
+        response = offload(
+            HttpResponse(content_type=content_type), path, full_path)
+    else:
+        header = request.META.get('HTTP_RANGE')
+        byte_range = None
+        if header and range_applies(request, etag, last_modified):
+            byte_range = parse_range(header, size)
+        if byte_range == (size, size):
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+        elif byte_range is not None:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                file_range(open(full_path, 'rb'), start, end - start + 1),
+                status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = end - start + 1
+        else:
+            response = FileResponse(
+                open(full_path, 'rb'), content_type=content_type)
+            response['Content-Length'] = size
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """Отдача загруженных файлов с условными запросами и Range.
+
+    В отличие от django.views.static.serve работает и при DEBUG = False.
+    """
+    full_path, stat = media_stat(path)
+    size = stat.st_size
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    last_modified = stat.st_mtime
+    not_modified = get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified))
+    if not_modified is not None:
+        return not_modified
+
+    response = media_body(
+        request, path, full_path, size, etag, last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if is_immutable(path):
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = (
+            f'public, max-age={settings.MEDIA_MAX_AGE}')
+    return response
@@ -1,5 +1,129 @@
+import datetime
+
 from django.contrib import admin
-from .models import Post, Group
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.db.models import Max, Min, QuerySet
+from django.forms import BaseModelFormSet
+from django.utils import timezone
+
+from .models import Comment, Follow, Group, Post
+from . import search
+from .paginators import ApproximateCountPaginator
+
+
+def truncate(value, kind):
+    if kind == 'year':
+        return datetime.date(value.year, 1, 1)
+    if kind == 'month':
+        return datetime.date(value.year, value.month, 1)
+    return value.date()
+
+
+def next_period(date, kind):
+    if kind == 'year':
+        return datetime.date(date.year + 1, 1, 1)
+    if kind == 'month':
+        if date.month == 12:
+            return datetime.date(date.year + 1, 1, 1)
+        return datetime.date(date.year, date.month + 1, 1)
+    return date + datetime.timedelta(days=1)
+
+
+class IndexedDatesQuerySet(QuerySet):
+    """Выборка для date_hierarchy, которая обходит индекс по дате.
+
+    В SQLite dates() вызывает функцию усечения даты для каждой строки,
+    а MIN и MAX в одном запросе читают весь индекс. Здесь каждая дата
+    иерархии и каждая граница — отдельный поиск по индексу с LIMIT 1:
+    запросов столько, сколько лет (месяцев, дней) в списке, и каждый
+    читает одну строку.
+    """
+
+    def first_value(self, field_name, descending=False, since=None):
+        queryset = self
+        if since is not None:
+            # Новая нижняя граница идёт в запросе первой: из нескольких
+            # границ по одному полю SQLite ищет в индексе по первой, а
+            # с границей периода date_hierarchy читал бы весь период
+            queryset = self.model._default_manager.filter(
+                **{f'{field_name}__gte': since}) & self
+        ordering = f'-{field_name}' if descending else field_name
+        return queryset.filter(**{f'{field_name}__isnull': False}).order_by(
+            ordering).values_list(field_name, flat=True).first()
+
+    @staticmethod
+    def is_field_bound(value):
+        """MIN или MAX по полю без условий: их можно взять из индекса."""
+        return (
+            type(value) in (Min, Max) and value.filter is None
+            and len(value.source_expressions) == 1
+            and hasattr(value.source_expressions[0], 'name')
+        )
+
+    def aggregate(self, *args, **kwargs):
+        if args or not all(map(self.is_field_bound, kwargs.values())):
+            return super().aggregate(*args, **kwargs)
+        return {
+            alias: self.first_value(
+                value.source_expressions[0].name, type(value) is Max)
+            for alias, value in kwargs.items()
+        }
+
+    def dates(self, field_name, kind, order='ASC'):
+        """Как QuerySet.dates(): даты в UTC, как их усекает СУБД."""
+        result = []
+        value = self.first_value(field_name)
+        while value is not None:
+            date = truncate(timezone.localtime(value, timezone.utc)
+                            if timezone.is_aware(value) else value, kind)
+            result.append(date)
+            start = datetime.datetime.combine(
+                next_period(date, kind), datetime.time())
+            if timezone.is_aware(value):
+                start = timezone.make_aware(start, timezone.utc)
+            value = self.first_value(field_name, since=start)
+        return result[::-1] if order == 'DESC' else result
+
+
+class PreloadedAutocompleteSelect(AutocompleteSelect):
+    """Поле с автодополнением, которое не загружает выбранный объект.
+
+    AutocompleteSelect выбирает его отдельным запросом, а в list_editable
+    это запрос на каждую строку списка. Здесь объект берётся из
+    `preloaded` (pk → объект); копии виджета в формах делят этот словарь.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.preloaded = {}
+
+    def optgroups(self, name, value, attr=None):
+        empty_values = self.choices.field.empty_values
+        objects = [self.preloaded.get(str(pk)) for pk in value
+                   if str(pk) not in empty_values]
+        if None in objects:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        for obj in objects:
+            options.append(self.create_option(
+                name, obj.pk, self.choices.field.label_from_instance(obj),
+                True, len(options)))
+        return [(None, options, 0)]
+
+
+class PostChangeListFormSet(BaseModelFormSet):
+    """Формсет list_editable: отдаёт виджету групп группы постов
+    страницы, уже загруженные через list_select_related."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        widget = self.form.base_fields['group'].widget
+        preloaded = getattr(widget, 'widget', widget).preloaded
+        for post in self.get_queryset():
+            if post.group_id:
+                preloaded[str(post.group_id)] = post.group
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -10,11 +134,66 @@ class PostAdmin(admin.ModelAdmin):
         'author',
         'group',
     )
+    list_select_related = ('author', 'group')
     list_editable = ('group',)
+    # Вместо <select> со всеми группами в каждой строке — поле с
+    # подгрузкой вариантов по мере ввода
+    autocomplete_fields = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    # Порядок индекса post_pub_date_idx: и первая страница, и страницы
+    # внутри периода date_hierarchy читаются по нему без сортировки
+    ordering = ('-pub_date', '-id')
     empty_value_display = '-пусто-'
+    paginator = ApproximateCountPaginator
+    # Без второго COUNT(*) по всей таблице ради «N из M»
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return IndexedDatesQuerySet(
+            model=queryset.model, query=queryset.query, using=queryset.db)
+
+    def get_changelist_formset(self, request, **kwargs):
+        widget = PreloadedAutocompleteSelect(
+            Post._meta.get_field('group').remote_field, self.admin_site)
+        return super().get_changelist_formset(
+            request, formset=PostChangeListFormSet,
+            widgets={'group': widget}, **kwargs)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по индексу FTS вместо LIKE '%…%' по всей таблице
+        if not search_term:
+            return queryset, False
+        return search.filter_posts(queryset, search_term), False
+
+
+class GroupAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'title', 'slug')
+    # Нужен полю группы с автодополнением в админке постов
+    search_fields = ('title', 'slug')
+
+
+class CommentAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'text', 'created', 'author', 'post')
+    list_select_related = ('author', 'post')
+    # Поля id вместо <select> со всеми постами, пользователями и
+    # комментариями
+    raw_id_fields = ('author', 'post', 'parent')
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+
+
+class FollowAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'user', 'author')
+    list_select_related = ('user', 'author')
+    raw_id_fields = ('user', 'author')
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
 
 
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
+admin.site.register(Group, GroupAdmin)
+admin.site.register(Comment, CommentAdmin)
+admin.site.register(Follow, FollowAdmin)
@@ -0,0 +1,298 @@
+"""Автодополнение авторов и групп по началу имени.
+
+Индекс — отсортированный список ключей в памяти процесса: поиск по
+префиксу — это bisect и чтение подряд идущих ключей, без запросов к БД.
+Ключи — имя пользователя, полное имя, фамилия и название группы с
+каждого слова, в нижнем регистре и с «е» вместо «ё».
+
+Индекс строится из БД при первом поиске, а потом обновляется по
+журналу изменений в кеше: сигналы сохранения и удаления пользователей и
+групп увеличивают версию и записывают под её номером, что изменилось.
+Перед поиском процесс применяет записи журнала, которых ещё не видел,
+перечитывая из БД только изменённые объекты. Если журнал потерян или
+отстал слишком сильно, индекс строится заново.
+
+Поиск читает индекс своего процесса, поэтому изменения из других
+процессов видны с задержкой синхронизации кеша.
+"""
+import bisect
+import heapq
+import re
+import sys
+import threading
+import time
+from array import array
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.urls import reverse
+
+from .models import Group
+
+User = get_user_model()
+
+VERSION_KEY = 'posts:autocomplete:version'
+CHANGE_KEY = 'posts:autocomplete:change:{}'
+CHANGE_TIMEOUT = 60 * 60
+# Сколько записей журнала применять по одной, прежде чем проще
+# перестроить индекс целиком
+MAX_CHANGES = 1000
+# Сколько изменённых объектов копить отдельно от основного индекса
+COMPACT_SIZE = 50000
+MAX_RESULTS = 20
+USER = 'user'
+GROUP = 'group'
+# Поля, от которых зависят ключи; сохранение с другими update_fields
+# (например, last_login при входе) индекс не меняет
+USER_FIELDS = {'username', 'first_name', 'last_name'}
+WORD_START_RE = re.compile(r'(?<=\s)\S')
+
+
+def normalize(text):
+    return ' '.join(text.casefold().replace('ё', 'е').split())
+
+
+def word_keys(text):
+    """Ключи для поиска с начала каждого слова: «анна ли», «ли»."""
+    text = normalize(text)
+    if not text:
+        return []
+    return [text] + [text[match.start():]
+                     for match in WORD_START_RE.finditer(text)]
+
+
+def user_keys(username, full_name):
+    return {normalize(username), *word_keys(full_name)} - {''}
+
+
+def group_keys(title, slug):
+    return set(word_keys(title))
+
+
+def user_data(username, first_name, last_name):
+    # Имя пользователя обычно совпадает со своим ключом, а полные имена
+    # — у тёзок: одна строка на все такие копии
+    return (sys.intern(username),
+            sys.intern(f'{first_name} {last_name}'.strip()))
+
+
+def group_data(title, slug):
+    return title, slug
+
+
+# Вид объекта → модель, поля, данные для ответа и ключи по этим данным
+SOURCES = {
+    USER: (User, ('username', 'first_name', 'last_name'),
+           user_data, user_keys),
+    GROUP: (Group, ('title', 'slug'), group_data, group_keys),
+}
+KINDS = tuple(SOURCES)
+
+
+def source_rows(kind, **filters):
+    model, fields, _, _ = SOURCES[kind]
+    return model.objects.filter(**filters).values_list('pk', *fields)
+
+
+def reference(kind, pk):
+    """Вид и pk объекта одним целым числом."""
+    return pk * len(KINDS) + KINDS.index(kind)
+
+
+def dereference(ref):
+    pk, kind = divmod(ref, len(KINDS))
+    return KINDS[kind], pk
+
+
+class Index:
+    """Отсортированные ключи со ссылками на объекты и их изменения.
+
+    Основная часть — параллельные массивы: `keys[i]` — ключ, `refs[i]` —
+    вид и pk его объекта (см. reference), пары отсортированы по ключу
+    и ссылке; одинаковые ключи хранятся одной строкой. Сдвигать
+    массивы в миллионы элементов на каждое изменение дорого, поэтому
+    ключи изменённых объектов лежат в небольшом отсортированном
+    списке `delta`, а их старые пары в основной части скрыты через
+    `hidden`. Когда изменений набирается COMPACT_SIZE, они вливаются в
+    основную часть.
+
+    `records` — данные объектов для ответа; из них же заново
+    вычисляются ключи, когда объект меняется ещё раз.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.refs = array('q')
+        self.delta = []
+        self.hidden = set()
+        self.records = {kind: {} for kind in KINDS}
+        self.version = None
+        self.lock = threading.Lock()
+
+    def record(self, kind, pk, fields):
+        """Запоминает данные объекта и возвращает его пары (ключ, ссылка)."""
+        _, _, data, keys = SOURCES[kind]
+        self.records[kind][pk] = record = data(*fields)
+        ref = reference(kind, pk)
+        return [(sys.intern(key), ref) for key in keys(*record)]
+
+    def build(self, version):
+        self.records = {kind: {} for kind in KINDS}
+        pairs = []
+        for kind in KINDS:
+            for pk, *fields in source_rows(kind).iterator():
+                pairs.extend(self.record(kind, pk, fields))
+        self.load(pairs)
+        self.version = version
+
+    def load(self, pairs):
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.refs = array('q', (ref for _, ref in pairs))
+        self.delta = []
+        self.hidden = set()
+
+    def compact(self):
+        """Вливает накопленные изменения в основные массивы."""
+        pairs = [pair for pair in zip(self.keys, self.refs)
+                 if pair[1] not in self.hidden]
+        self.load(pairs + self.delta)
+
+    def refresh(self, kind, pk):
+        """Перечитывает объект из БД и заменяет его ключи."""
+        ref = reference(kind, pk)
+        record = self.records[kind].pop(pk, None)
+        if record is not None and ref in self.hidden:
+            # Ключи прошлого изменения лежат в delta
+            for key in SOURCES[kind][3](*record):
+                position = bisect.bisect_left(self.delta, (key, ref))
+                if self.delta[position:position + 1] == [(key, ref)]:
+                    del self.delta[position]
+        self.hidden.add(ref)
+        for _, *fields in source_rows(kind, pk=pk):
+            for pair in self.record(kind, pk, fields):
+                bisect.insort(self.delta, pair)
+        if len(self.hidden) > COMPACT_SIZE:
+            self.compact()
+
+    def is_stale(self, current):
+        return (
+            self.version is None
+            or not 0 < current - self.version <= MAX_CHANGES
+        )
+
+    def sync(self):
+        """Догоняет журнал изменений или строит индекс заново."""
+        current = cache.get(VERSION_KEY)
+        if current is None:
+            current = start_version()
+        if current == self.version:
+            return
+        if self.is_stale(current):
+            self.build(current)
+            return
+        keys = [CHANGE_KEY.format(version)
+                for version in range(self.version + 1, current + 1)]
+        changes = cache.get_many(keys)
+        if len(changes) < len(keys):
+            self.build(current)
+            return
+        for key in keys:
+            self.refresh(*changes[key])
+        self.version = current
+
+    def scan(self, prefix):
+        """Пары основной части с ключом на `prefix`, кроме скрытых."""
+        position = bisect.bisect_left(self.keys, prefix)
+        while position < len(self.keys):
+            key = self.keys[position]
+            if not key.startswith(prefix):
+                return
+            ref = self.refs[position]
+            position += 1
+            if ref not in self.hidden:
+                yield key, ref
+
+    def scan_delta(self, prefix):
+        position = bisect.bisect_left(self.delta, (prefix,))
+        while position < len(self.delta):
+            key, ref = self.delta[position]
+            if not key.startswith(prefix):
+                return
+            position += 1
+            yield key, ref
+
+    def search(self, prefix, limit):
+        """До `limit` объектов, у которых ключ начинается с `prefix`."""
+        found = []
+        seen = set()
+        pairs = heapq.merge(self.scan(prefix), self.scan_delta(prefix))
+        for _, ref in pairs:
+            if len(found) == limit:
+                break
+            if ref not in seen:
+                seen.add(ref)
+                kind, pk = dereference(ref)
+                found.append((kind, self.records[kind][pk]))
+        return found
+
+
+index = Index()
+
+
+def start_version():
+    """Версия журнала, если её нет в кеше.
+
+    Как и версии областей кеша страниц, начинается с текущего времени:
+    процесс, видевший потерянный журнал, не примет новый за его
+    продолжение и перестроит индекс.
+    """
+    cache.add(VERSION_KEY, int(time.time() * 1000), None)
+    return cache.get(VERSION_KEY)
+
+
+def record_change(kind, pk):
+    start_version()
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        version = start_version()
+    cache.set(CHANGE_KEY.format(version), (kind, pk), CHANGE_TIMEOUT)
+
+
+def changed(kind, pk):
+    """Записывает в журнал, что объект создан, изменён или удалён.
+
+    Запись делается сразу и ещё раз после коммита: процесс, прочитавший
+    объект до коммита, перечитает его снова.
+    """
+    record_change(kind, pk)
+    transaction.on_commit(lambda: record_change(kind, pk))
+
+
+def as_json(kind, data):
+    if kind == USER:
+        username, full_name = data
+        return {
+            'type': USER,
+            'label': f'{full_name} ({username})' if full_name else username,
+            'url': reverse('posts:profile', args=[username]),
+        }
+    title, slug = data
+    return {
+        'type': GROUP,
+        'label': title,
+        'url': reverse('posts:group_list', args=[slug]),
+    }
+
+
+def suggest(query, limit=10):
+    """Подсказки для начала имени: список словарей type, label, url."""
+    prefix = normalize(query)
+    if not prefix:
+        return []
+    with index.lock:
+        index.sync()
+        found = index.search(prefix, min(limit, MAX_RESULTS))
+    return [as_json(kind, data) for kind, data in found]
@@ -0,0 +1,176 @@
+"""Кеширование страниц с инвалидацией по событиям.
+
+Каждая закешированная страница относится к одной или нескольким
+«областям» (лента на главной, страница поста, лента группы, профиль).
+У области есть версия, которая входит в ключ кеша страницы; изменение
+поста, комментария, группы или подписки увеличивает версии затронутых
+областей, и старые ответы больше не находятся в кеше.
+
+Истёкшую страницу перестраивает один запрос, остальные получают
+устаревшую копию (stale-while-revalidate), а срок жизни страницы
+вероятностно сокращается, чтобы истечения не совпадали во времени.
+"""
+import hashlib
+import math
+import random
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+VERSION_KEY = 'posts:scope-version:{}'
+# Сколько ещё можно отдавать истёкшую страницу, пока её перестраивают
+STALE_TIMEOUT = 60 * 10
+LOCK_TIMEOUT = 30
+WAIT_TIMEOUT = 2
+WAIT_STEP = 0.05
+
+
+def version_keys(scopes):
+    return [VERSION_KEY.format(scope) for scope in scopes]
+
+
+def get_versions(scopes):
+    """Версии областей; отсутствующие создаются.
+
+    Новая версия берётся из текущего времени, а не начинается с единицы,
+    чтобы после вытеснения ключа версии из кеша не ожили старые ответы.
+    """
+    keys = version_keys(scopes)
+    versions = cache.get_many(keys)
+    missing = {
+        key: int(time.time() * 1000) for key in keys if key not in versions
+    }
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def invalidate(*scopes):
+    """Увеличивает версии областей — их страницы перестают находиться."""
+    for key in version_keys(set(scopes)):
+        try:
+            cache.incr(key)
+        except ValueError:
+            pass
+
+
+def index_scope():
+    return 'index'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def profile_scope(username):
+    return f'profile:{username}'
+
+
+def page_key(request, versions):
+    """Ключ ответа: версии областей, адрес и cookie (как Vary: Cookie)."""
+    url = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    cookie = hashlib.md5(
+        request.META.get('HTTP_COOKIE', '').encode()).hexdigest()
+    scope = '.'.join(str(version) for version in versions)
+    return f'posts:page:{scope}:{request.method}:{url}:{cookie}'
+
+
+def is_fresh(entry, beta, now=None):
+    """Вероятностное досрочное истечение (XFetch).
+
+    Чем дольше страница строилась (`delta`) и чем ближе срок истечения,
+    тем выше шанс, что этот запрос перестроит её заранее — так истечения
+    у разных воркеров разносятся во времени.
+    """
+    now = time.time() if now is None else now
+    early = entry['delta'] * beta * -math.log(1 - random.random())
+    return now + early < entry['expires']
+
+
+def store(key, response, timeout, delta):
+    entry = {
+        'content': response.content,
+        'status': response.status_code,
+        'headers': list(response.items()),
+        'expires': time.time() + timeout,
+        'delta': delta,
+    }
+    # Запись живёт дольше своего срока, чтобы её можно было отдать
+    # устаревшей, пока другой воркер строит новую
+    cache.set(key, entry, timeout + STALE_TIMEOUT)
+
+
+def restore(entry):
+    response = HttpResponse(entry['content'], status=entry['status'])
+    for header, value in entry['headers']:
+        response[header] = value
+    return response
+
+
+def is_cacheable(request, response):
+    if response.status_code != 200 or response.streaming:
+        return False
+    # Как в CacheMiddleware: не кешируем ответы, выставляющие cookie
+    # запросу без cookie
+    return not (response.cookies and not request.COOKIES)
+
+
+def wait_for(key):
+    """Ждёт, пока страницу без устаревшей копии построит другой запрос."""
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_STEP)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def cache_page_by_scopes(timeout, scopes, beta=1.0):
+    """Замена cache_page с инвалидацией по областям и защитой от
+    «набега» на истёкший кеш.
+
+    `scopes` получает аргументы представления и возвращает список
+    областей, к которым относится страница. Истёкшую страницу
+    перестраивает один запрос (взявший блокировку в кеше), остальные в
+    это время получают устаревшую копию.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            versions = get_versions(scopes(*args, **kwargs))
+            key = page_key(request, versions)
+            entry = cache.get(key)
+            if entry is not None and is_fresh(entry, beta):
+                return restore(entry)
+
+            lock = f'{key}:lock'
+            locked = cache.add(lock, True, LOCK_TIMEOUT)
+            if not locked:
+                if entry is None:
+                    entry = wait_for(key)
+                if entry is not None:
+                    return restore(entry)
+            try:
+                started = time.monotonic()
+                response = view(request, *args, **kwargs)
+                patch_vary_headers(response, ('Cookie',))
+                if is_cacheable(request, response):
+                    store(key, response, timeout,
+                          time.monotonic() - started)
+            finally:
+                if locked:
+                    cache.delete(lock)
+            return response
+        return wrapper
+    return decorator
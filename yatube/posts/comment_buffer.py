@@ -0,0 +1,226 @@
+"""Буферизованная запись комментариев (COMMENT_BUFFER).
+
+В этом режиме add_comment только проверяет форму и ставит комментарий
+в очередь процесса, а фоновый поток вставляет комментарии пачками через
+bulk_create: вместо транзакции на каждый комментарий — одна на пачку, и
+всплеск комментариев к популярному посту меньше держит блокировку
+записи SQLite, которую ждут и остальные запросы.
+
+bulk_create не отправляет сигналы, поэтому то, что при обычном
+сохранении делают обработчики, здесь делается на всю пачку сразу:
+пути веток (posts.threads) — одним UPDATE на родителя, счётчики
+комментариев и инвалидация страниц — по одному разу на пост.
+
+Пока комментарий в очереди, автор видит его на странице поста: каждый
+ждущий комментарий лежит в кеше под своим номером в очереди пары
+(пост, пользователь) — номер выдаёт атомарный incr, так что
+одновременные комментарии не затирают друг друга, — и после записи
+удаляется. Кеш страниц для остальных читателей при этом не
+сбрасывается: автору ставится cookie, а cookie входит в ключ страницы,
+так что новую страницу получает только он. Страницы поста и лент
+сбрасываются один раз на записанную пачку.
+
+Если очередь переполнена или пачку не удалось вставить, комментарии
+сохраняются по одному обычным способом.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat, LPad
+
+from . import caching, counters, threads
+from .models import Comment, Post
+from .signals import comment_cache_scopes
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'posts:pending-comment:{}:{}:{}'
+PENDING_COUNTER_KEY = 'posts:pending-comments:{}:{}'
+PENDING_TIMEOUT = 60 * 5
+# Сколько последних ждущих комментариев пары (пост, пользователь)
+# показывать автору
+PENDING_LIMIT = 50
+# Cookie с токеном последнего комментария в очереди: меняет ключ
+# закешированных страниц только у автора
+COOKIE_NAME = 'pending_comment'
+QUEUE_SIZE = 10000
+# Сколько ждать места в переполненной очереди, секунд
+PUT_TIMEOUT = 1
+
+_queue = queue.Queue(maxsize=QUEUE_SIZE)
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def is_enabled():
+    return settings.COMMENT_BUFFER
+
+
+def pending_key(post_id, user_id, number):
+    return PENDING_KEY.format(post_id, user_id, number)
+
+
+def counter_key(post_id, user_id):
+    return PENDING_COUNTER_KEY.format(post_id, user_id)
+
+
+def enqueue(comment):
+    """Ставит несохранённый комментарий в очередь на запись."""
+    comment.buffer_token = uuid.uuid4().hex
+    counter = counter_key(comment.post_id, comment.author_id)
+    cache.add(counter, 0, PENDING_TIMEOUT)
+    comment.buffer_key = pending_key(
+        comment.post_id, comment.author_id, cache.incr(counter))
+    cache.set(comment.buffer_key, {
+        'token': comment.buffer_token,
+        'text': comment.text,
+        'parent_id': comment.parent_id,
+    }, PENDING_TIMEOUT)
+    try:
+        _queue.put(comment, timeout=PUT_TIMEOUT)
+    except queue.Full:
+        save_one(comment)
+        return
+    if settings.COMMENT_BUFFER_WORKER:
+        _start_worker()
+
+
+def pending(post_id, user):
+    """Комментарии пользователя к посту, которые ещё ждут записи."""
+    if not is_enabled() or not user.is_authenticated:
+        return []
+    last = cache.get(counter_key(post_id, user.pk))
+    if not last:
+        return []
+    keys = [
+        pending_key(post_id, user.pk, number)
+        for number in range(max(last - PENDING_LIMIT, 0) + 1, last + 1)
+    ]
+    found = cache.get_many(keys)
+    return [found[key] for key in keys if key in found]
+
+
+def _start_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(
+                target=_work, name='comment-buffer', daemon=True)
+            _worker.start()
+
+
+def _work():
+    while True:
+        batch = _take_batch()
+        try:
+            write(batch)
+        finally:
+            close_old_connections()
+
+
+def _take_batch():
+    """Ждёт первый комментарий, затем добирает пачку не дольше
+    COMMENT_BUFFER_WAIT секунд."""
+    batch = [_queue.get()]
+    deadline = time.monotonic() + settings.COMMENT_BUFFER_WAIT
+    while len(batch) < settings.COMMENT_BUFFER_BATCH_SIZE:
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            break
+        try:
+            batch.append(_queue.get(timeout=timeout))
+        except queue.Empty:
+            break
+    return batch
+
+
+def flush():
+    """Записывает всё, что сейчас в очереди, в текущем потоке."""
+    batch = []
+    while True:
+        try:
+            batch.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    size = settings.COMMENT_BUFFER_BATCH_SIZE
+    for start in range(0, len(batch), size):
+        write(batch[start:start + size])
+
+
+atexit.register(flush)
+
+
+def write(batch):
+    """Вставляет пачку; если не вышло — сохраняет комментарии по одному."""
+    try:
+        with transaction.atomic():
+            written = insert(batch)
+    except Exception:
+        logger.exception('Не удалось записать пачку комментариев')
+        for comment in batch:
+            save_one(comment)
+        return
+    # Число комментариев видно и в карточках лент
+    scopes = []
+    for post_id in {comment.post_id for comment in written}:
+        scopes.extend(comment_cache_scopes(post_id))
+    caching.invalidate(*scopes)
+    forget_pending(batch)
+
+
+def insert(batch):
+    """bulk_create пачки и то, что для одиночного комментария делают
+    сигналы. Комментарии к удалённым постам и в ответ на удалённые
+    комментарии отбрасываются."""
+    post_ids = set(Post.objects.filter(
+        pk__in={comment.post_id for comment in batch}).values_list(
+        'pk', flat=True))
+    parents = Comment.objects.in_bulk(
+        {comment.parent_id for comment in batch if comment.parent_id})
+    written = [
+        comment for comment in batch
+        if comment.post_id in post_ids
+        and (comment.parent_id is None or comment.parent_id in parents)
+    ]
+    Comment.objects.bulk_create(written)
+    # id вставленных строк SQLite не возвращает: пути дописываются
+    # по строкам, где их ещё нет
+    fresh = Comment.objects.filter(post_id__in=post_ids, path='')
+    fresh.filter(parent=None).update(path=path_expression(''))
+    for parent in {parents[c.parent_id] for c in written if c.parent_id}:
+        fresh.filter(parent=parent).update(
+            path=path_expression(parent.path), depth=parent.depth + 1)
+    for post_id, total in Counter(c.post_id for c in written).items():
+        counters.change_post(post_id, total)
+    return written
+
+
+def path_expression(parent_path):
+    """Путь комментария, вычисляемый в UPDATE по id строки."""
+    return Concat(
+        Value(parent_path),
+        LPad(Cast('id', CharField()), threads.SEGMENT, Value('0')),
+        output_field=CharField(),
+    )
+
+
+def save_one(comment):
+    try:
+        comment.save()
+    except Exception:
+        logger.exception('Не удалось сохранить комментарий')
+    forget_pending([comment])
+
+
+def forget_pending(batch):
+    """Убирает записанные комментарии из ждущих у их авторов."""
+    cache.delete_many([comment.buffer_key for comment in batch])
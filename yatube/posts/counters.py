@@ -0,0 +1,82 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются атомарно через F()-выражения в сигналах создания и
+удаления объектов; расхождения исправляет команда reconcile_counters.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+def change(queryset, field, delta):
+    """Прибавляет `delta` к счётчику, не опуская его ниже нуля."""
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def change_user(user_id, field, delta):
+    change(UserStats.objects.filter(user_id=user_id), field, delta)
+
+
+def change_post(post_id, delta):
+    change(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def stats_for(user):
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return UserStats.objects.get_or_create(user=user)[0]
+
+
+def _actual(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+COUNTERS = (
+    (UserStats, 'posts_count', Post, 'author'),
+    (UserStats, 'followers_count', Follow, 'author'),
+    (UserStats, 'following_count', Follow, 'user'),
+    (Post, 'comments_count', Comment, 'post'),
+)
+
+
+def reconcile():
+    """Пересчитывает все счётчики и возвращает число исправлений
+    по каждому из них."""
+    UserStats.objects.bulk_create(
+        [
+            UserStats(user_id=user_id)
+            for user_id in User.objects.filter(
+                stats__isnull=True).values_list('pk', flat=True)
+        ],
+        ignore_conflicts=True,
+    )
+    fixed = {}
+    for model, field, source, source_field in COUNTERS:
+        drifted = (
+            model.objects
+            .annotate(actual=_actual(source, source_field))
+            .exclude(**{field: F('actual')})
+            .values_list('pk', 'actual')
+        )
+        fixed[f'{model.__name__}.{field}'] = 0
+        for pk, actual in list(drifted):
+            model.objects.filter(pk=pk).update(**{field: actual})
+            fixed[f'{model.__name__}.{field}'] += 1
+    return fixed
@@ -1,4 +1,6 @@
-from django.forms import ModelForm
+from django.conf import settings
+from django.forms import ModelForm, ValidationError
+from django.template.defaultfilters import filesizeformat
 from .models import Post, Comment
 
 
@@ -11,6 +13,34 @@ class PostForm(ModelForm):
             'group': 'Группа',
             'image': 'Изображение'
         }
+        error_messages = {
+            'image': {
+                # Сюда же попадают «бомбы» больше двух MAX_IMAGE_PIXELS
+                # Pillow: их он отклоняет по заголовку, не декодируя
+                'invalid_image': (
+                    'Загрузите корректное изображение не больше '
+                    f'{settings.POST_IMAGE_MAX_PIXELS // 1_000_000} '
+                    'мегапикселей.'
+                ),
+            },
+        }
+
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        limit = settings.POST_IMAGE_MAX_BYTES
+        if image and image.size > limit:
+            raise ValidationError(
+                f'Размер файла не должен превышать {filesizeformat(limit)}.')
+        # У нового файла ImageField уже открыл картинку; её размеры
+        # прочитаны из заголовка, пиксели не декодировались
+        opened = getattr(image, 'image', None)
+        if opened is not None:
+            width, height = opened.size
+            if width * height > settings.POST_IMAGE_MAX_PIXELS:
+                raise ValidationError(
+                    self.fields['image'].error_messages['invalid_image'],
+                    code='invalid_image')
+        return image
 
 
 class CommentForm(ModelForm):
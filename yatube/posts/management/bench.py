@@ -0,0 +1,46 @@
+"""Отдельная база SQLite для нагрузочных команд.
+
+Команды bench_* создают сотни тысяч записей через bulk_create; чтобы
+они не попадали в рабочую базу проекта, замер идёт в отдельном файле
+SQLite, к которому на время команды переключается соединение default.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connections
+
+
+def add_database_argument(parser):
+    parser.add_argument(
+        '--database', metavar='PATH',
+        help='Файл SQLite для замера: сохраняется, и следующий запуск '
+             'использует уже созданные записи. По умолчанию — временный '
+             'файл, который удаляется после замера.')
+
+
+@contextmanager
+def scratch_database(path=None):
+    """Переключает соединение default на файл SQLite `path` (или на
+    временный файл) с применёнными миграциями."""
+    connection = connections['default']
+    if connection.vendor != 'sqlite':
+        raise CommandError('Замеры рассчитаны на SQLite.')
+    original_name = connection.settings_dict['NAME']
+    temporary = path is None
+    if temporary:
+        descriptor, path = tempfile.mkstemp(
+            prefix='yatube-bench-', suffix='.sqlite3')
+        os.close(descriptor)
+    connection.close()
+    connection.settings_dict['NAME'] = path
+    try:
+        call_command('migrate', verbosity=0, interactive=False)
+        yield path
+    finally:
+        connection.close()
+        connection.settings_dict['NAME'] = original_name
+        if temporary:
+            os.remove(path)
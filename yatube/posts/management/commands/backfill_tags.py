@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import tags
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Заполняет теги и упоминания по текстам уже существующих '
+            'постов. Посты читаются пачками по возрастанию id; повторный '
+            'запуск ничего не дублирует.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=2000,
+            help='Сколько постов обрабатывать в одной транзакции.')
+        parser.add_argument(
+            '--after', type=int, default=0,
+            help='Начать с постов, id которых больше этого.')
+
+    def handle(self, *args, **options):
+        last_pk = options['after']
+        started = time.monotonic()
+        processed = tagged = mentioned = 0
+        posts = Post.objects.order_by('pk').only('pk', 'text', 'pub_date')
+        while True:
+            batch = list(
+                posts.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            with transaction.atomic():
+                post_tags, mentions = tags.index_posts(batch)
+            last_pk = batch[-1].pk
+            processed += len(batch)
+            tagged += post_tags
+            mentioned += mentions
+            self.stdout.write(
+                f'До поста {last_pk}: обработано {processed}', ending='\r')
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'\nПостов: {processed}, тегов: {tagged}, упоминаний: '
+            f'{mentioned}, за {elapsed:.1f} с')
@@ -0,0 +1,121 @@
+import random
+import statistics
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from posts import autocomplete
+from posts.management.bench import add_database_argument, scratch_database
+
+User = get_user_model()
+
+BENCH_PREFIX = 'bench-'
+BATCH_SIZE = 10000
+FIRST_NAMES = ('Анна Иван Мария Пётр Ольга Сергей Елена Алексей Наталья '
+               'Дмитрий Юлия Андрей Татьяна Михаил').split()
+LAST_NAMES = ('Иванов Смирнов Кузнецов Попов Васильев Петров Соколов '
+              'Михайлов Новиков Фёдоров Морозов Волков Алексеев').split()
+
+
+class Command(BaseCommand):
+    help = ('Замеряет построение индекса автодополнения, поиск по префиксу '
+            'в нём и через LIKE в БД, и обновление одного пользователя.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=1_000_000,
+            help='Сколько пользователей должно быть в базе замера.')
+        parser.add_argument('--lookups', type=int, default=10000)
+        add_database_argument(parser)
+
+    def handle(self, *args, **options):
+        with scratch_database(options['database']):
+            self.benchmark(options)
+
+    def benchmark(self, options):
+        self.populate(options['users'])
+        index = autocomplete.Index()
+        start = time.perf_counter()
+        index.build(0)
+        build_s = time.perf_counter() - start
+        # Память — по второму построению: трассировка замедляет его
+        index = autocomplete.Index()
+        tracemalloc.start()
+        index.build(0)
+        size, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stdout.write(
+            f'Пользователей: {User.objects.count()}, ключей: '
+            f'{len(index.keys)}, построение: {build_s:.1f} с, память: '
+            f'{size // 2 ** 20} МБ (пик {peak // 2 ** 20} МБ)')
+
+        generator = random.Random(0)
+        prefixes = [
+            key[:generator.randint(1, 6)]
+            for key in generator.choices(index.keys, k=options['lookups'])
+        ]
+        timings = []
+        for prefix in prefixes:
+            start = time.perf_counter()
+            index.search(prefix, 10)
+            timings.append((time.perf_counter() - start) * 1000)
+        self.report('индекс', timings)
+
+        timings = []
+        for prefix in prefixes[:100]:
+            start = time.perf_counter()
+            list(User.objects.filter(
+                Q(username__istartswith=prefix)
+                | Q(first_name__istartswith=prefix)
+                | Q(last_name__istartswith=prefix)
+            ).values_list('username')[:10])
+            timings.append((time.perf_counter() - start) * 1000)
+        self.report('БД, LIKE', timings)
+
+        users = User.objects.filter(
+            username__startswith=BENCH_PREFIX).values_list('pk', flat=True)
+        timings = []
+        for pk in users[:1000]:
+            start = time.perf_counter()
+            index.refresh(autocomplete.USER, pk)
+            timings.append((time.perf_counter() - start) * 1000)
+        self.report('обновление пользователя', timings)
+        timings = []
+        for prefix in prefixes:
+            start = time.perf_counter()
+            index.search(prefix, 10)
+            timings.append((time.perf_counter() - start) * 1000)
+        self.report('индекс после обновлений', timings)
+
+    def report(self, name, timings):
+        timings = sorted(timings)
+        p99 = timings[int(len(timings) * 0.99) - 1]
+        self.stdout.write(
+            f'{name}: медиана {statistics.median(timings):.3f} мс, '
+            f'p99 {p99:.3f} мс, максимум {timings[-1]:.3f} мс')
+
+    def populate(self, count):
+        missing = count - User.objects.count()
+        if missing <= 0:
+            return
+        self.stdout.write(f'Создаём {missing} пользователей...')
+        generator = random.Random(0)
+        offset = User.objects.filter(
+            username__startswith=BENCH_PREFIX).count()
+        while missing > 0:
+            size = min(BATCH_SIZE, missing)
+            with transaction.atomic():
+                User.objects.bulk_create(
+                    User(
+                        username=f'{BENCH_PREFIX}{offset + i}',
+                        first_name=generator.choice(FIRST_NAMES),
+                        last_name=generator.choice(LAST_NAMES),
+                    )
+                    for i in range(size)
+                )
+            offset += size
+            missing -= size
@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import Counter
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.views.decorators.cache import cache_page
+
+from posts import caching, views
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест главной страницы: сравнивает число запросов '
+            'к БД в секунду при истечениях кеша для cache_page и для '
+            'кеша с защитой от набега.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--seconds', type=int, default=20)
+        parser.add_argument(
+            '--timeout', type=int, default=3,
+            help='Время жизни страницы в кеше, секунд.')
+
+    def handle(self, *args, **options):
+        view = views.index.__wrapped__
+        timeout = options['timeout']
+        modes = {
+            'cache_page': cache_page(timeout)(view),
+            'single-flight': caching.cache_page_by_scopes(
+                timeout, lambda: ['bench'])(view),
+        }
+        for name, cached_view in modes.items():
+            cache.clear()
+            queries, requests = self.load(
+                cached_view, options['threads'], options['seconds'])
+            per_second = [queries[second]
+                          for second in range(options['seconds'])]
+            self.stdout.write(
+                f'{name}: запросов к странице {requests}, '
+                f'запросов к БД по секундам {per_second}, '
+                f'максимум {max(per_second)}'
+            )
+
+    def load(self, cached_view, threads, seconds):
+        queries = Counter()
+        requests = Counter()
+        lock = threading.Lock()
+        started = time.monotonic()
+        deadline = started + seconds
+
+        def count_query(execute, sql, params, many, context):
+            with lock:
+                queries[int(time.monotonic() - started)] += 1
+            return execute(sql, params, many, context)
+
+        def worker():
+            factory = RequestFactory()
+            with connection.execute_wrapper(count_query):
+                while time.monotonic() < deadline:
+                    request = factory.get('/')
+                    request.user = AnonymousUser()
+                    cached_view(request)
+                    with lock:
+                        requests['total'] += 1
+            connection.close()
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        return queries, requests['total']
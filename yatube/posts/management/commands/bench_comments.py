@@ -0,0 +1,118 @@
+import statistics
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+BENCH_PREFIX = 'bench-commenter-'
+# Сколько ждать, пока фоновый поток запишет очередь, секунд
+DRAIN_TIMEOUT = 60
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест комментариев к одному посту: потоки-авторы '
+            'отправляют комментарии через add_comment, потоки-читатели '
+            'открывают страницу поста. Сравнивает обычную и '
+            'буферизованную (COMMENT_BUFFER) запись.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument(
+            '--mode', choices=('sync', 'buffered', 'both'), default='both')
+
+    def handle(self, *args, **options):
+        users = [
+            User.objects.get_or_create(username=f'{BENCH_PREFIX}{i}')[0]
+            for i in range(options['writers'])
+        ]
+        post = Post.objects.create(author=users[0], text='Горячий пост')
+        modes = (('sync', 'buffered') if options['mode'] == 'both'
+                 else (options['mode'],))
+        try:
+            for mode in modes:
+                with override_settings(COMMENT_BUFFER=mode == 'buffered',
+                                       COMMENT_BUFFER_WORKER=True):
+                    self.run(mode, post, users, options)
+        finally:
+            post.delete()
+
+    def run(self, mode, post, users, options):
+        before = Comment.objects.filter(post=post).count()
+        deadline = time.monotonic() + options['seconds']
+        results = {'writes': [], 'reads': [], 'errors': []}
+        threads = [
+            threading.Thread(
+                target=self.write, args=(post, user, deadline, results))
+            for user in users
+        ] + [
+            threading.Thread(target=self.read, args=(post, deadline, results))
+            for _ in range(options['readers'])
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        sent = len(results['writes'])
+        # Комментарии из очереди ещё записываются
+        while (Comment.objects.filter(post=post).count() - before < sent
+               and time.monotonic() - started < DRAIN_TIMEOUT):
+            time.sleep(0.01)
+        elapsed = time.monotonic() - started
+        written = Comment.objects.filter(post=post).count() - before
+        self.stdout.write(
+            f'{mode}: записано {written} из {sent} за {elapsed:.1f} с '
+            f'({written / elapsed:.0f} комментариев/с), ошибок '
+            f'{len(results["errors"])}')
+        self.report('  add_comment', results['writes'])
+        self.report('  страница поста', results['reads'])
+
+    def write(self, post, user, deadline, results):
+        client = Client()
+        client.force_login(user)
+        url = reverse('posts:add_comment', args=[post.pk])
+        try:
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = client.post(url, {'text': 'Комментарий'})
+                except Exception:
+                    results['errors'].append(1)
+                    continue
+                if response.status_code == 302:
+                    results['writes'].append(
+                        (time.perf_counter() - start) * 1000)
+                else:
+                    results['errors'].append(1)
+        finally:
+            connection.close()
+
+    def read(self, post, deadline, results):
+        client = Client()
+        url = reverse('posts:post_detail', args=[post.pk])
+        try:
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                client.get(url)
+                results['reads'].append((time.perf_counter() - start) * 1000)
+        finally:
+            connection.close()
+
+    def report(self, name, timings):
+        if not timings:
+            return
+        timings = sorted(timings)
+        p99 = timings[int(len(timings) * 0.99) - 1]
+        self.stdout.write(
+            f'{name}: {len(timings)} запросов, медиана '
+            f'{statistics.median(timings):.1f} мс, p99 {p99:.1f} мс')
@@ -0,0 +1,87 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+
+from posts import counters
+from posts.management.bench import add_database_argument, scratch_database
+from posts.models import Post
+from posts.paginators import CursorPaginator
+
+User = get_user_model()
+
+BENCH_USERNAME = 'pagination-bench'
+BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время выборки страниц ленты при OFFSET- и '
+            'курсорной пагинации на разной глубине.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=1_000_000,
+            help='Сколько постов должно быть в базе замера.')
+        parser.add_argument('--per-page', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=5)
+        add_database_argument(parser)
+
+    def handle(self, *args, **options):
+        with scratch_database(options['database']):
+            self.benchmark(options)
+
+    def benchmark(self, options):
+        self.populate(options['posts'])
+        post_list = Post.objects.order_by('-pub_date', '-id')
+        per_page = options['per_page']
+        total = post_list.count()
+        depths = [1]
+        while depths[-1] * 10 <= total // per_page:
+            depths.append(depths[-1] * 10)
+
+        self.stdout.write(f'Постов: {total}')
+        self.stdout.write(f'{"страница":>10} {"offset, мс":>12} '
+                          f'{"cursor, мс":>12}')
+        for depth in depths:
+            offset_ms = self.measure(
+                lambda: list(Paginator(post_list, per_page).page(depth)),
+                options['repeat'],
+            )
+            cursor_paginator = CursorPaginator(post_list, per_page)
+            token = None
+            if depth > 1:
+                last = post_list[(depth - 1) * per_page - 1]
+                token = cursor_paginator.encode(last)
+            cursor_ms = self.measure(
+                lambda: list(cursor_paginator.page(after=token)),
+                options['repeat'],
+            )
+            self.stdout.write(
+                f'{depth:>10} {offset_ms:>12.2f} {cursor_ms:>12.2f}')
+
+    def measure(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings) * 1000
+
+    def populate(self, count):
+        missing = count - Post.objects.count()
+        if missing <= 0:
+            return
+        author, _ = User.objects.get_or_create(username=BENCH_USERNAME)
+        counters.stats_for(author)
+        self.stdout.write(f'Создаём {missing} постов...')
+        while missing > 0:
+            size = min(BATCH_SIZE, missing)
+            with transaction.atomic():
+                Post.objects.bulk_create(
+                    Post(author=author, text=f'Пост для замера {i}')
+                    for i in range(size)
+                )
+                counters.change_user(author.pk, 'posts_count', size)
+            missing -= size
@@ -0,0 +1,99 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import counters, search
+from posts.management.bench import add_database_argument, scratch_database
+from posts.models import Post
+
+User = get_user_model()
+
+BENCH_USERNAME = 'search-bench'
+BATCH_SIZE = 10000
+WORDS = (
+    'яндекс практикум джанго питон город море лес книга музыка кино '
+    'работа учёба дорога поезд самолёт погода зима весна лето осень '
+    'кофе чай завтрак ужин собака кошка друг семья проект релиз'
+).split()
+# В каждом посте есть одна метка из RARE_WORDS вариантов: по ней
+# находится примерно один пост из RARE_WORDS
+RARE_WORDS = 10000
+# Частое слово, пара слов, префикс и редкая метка (как префикс она
+# находит и «метка420»…«метка429» и т. п.)
+QUERIES = ('кофе', 'самолёт осень', 'пит', 'метка42')
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время поиска по постам через индекс FTS5 и через '
+            'LIKE по тексту: число найденных и первая страница выдачи.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=1_000_000,
+            help='Сколько постов должно быть в базе замера.')
+        parser.add_argument('--per-page', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=5)
+        add_database_argument(parser)
+
+    def handle(self, *args, **options):
+        with scratch_database(options['database']):
+            self.benchmark(options)
+
+    def benchmark(self, options):
+        self.populate(options['posts'])
+        per_page = options['per_page']
+        self.stdout.write(f'Постов: {Post.objects.count()}')
+        self.stdout.write(f'{"запрос":>20} {"найдено":>10} '
+                          f'{"LIKE, мс":>10} {"FTS5, мс":>10}')
+        for query in QUERIES:
+            like_posts = Post.objects.select_related('author', 'group')
+            for word in search.words(query):
+                like_posts = like_posts.filter(text__icontains=word)
+            like_ms = self.measure(
+                lambda: (like_posts.count(), list(
+                    like_posts.order_by('-pub_date', '-id')[:per_page])),
+                options['repeat'],
+            )
+            results = search.SearchResults(query)
+            fts_ms = self.measure(
+                lambda: (results.count(), results[:per_page]),
+                options['repeat'],
+            )
+            self.stdout.write(
+                f'{query:>20} {results.count():>10} '
+                f'{like_ms:>10.2f} {fts_ms:>10.2f}')
+
+    def measure(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings) * 1000
+
+    def text(self, generator):
+        words = generator.choices(WORDS, k=generator.randint(5, 40))
+        words.append(f'метка{generator.randrange(RARE_WORDS)}')
+        generator.shuffle(words)
+        return ' '.join(words).capitalize()
+
+    def populate(self, count):
+        missing = count - Post.objects.count()
+        if missing <= 0:
+            return
+        author, _ = User.objects.get_or_create(username=BENCH_USERNAME)
+        counters.stats_for(author)
+        self.stdout.write(f'Создаём {missing} постов...')
+        generator = random.Random(0)
+        while missing > 0:
+            size = min(BATCH_SIZE, missing)
+            with transaction.atomic():
+                Post.objects.bulk_create(
+                    Post(author=author, text=self.text(generator))
+                    for _ in range(size)
+                )
+                counters.change_user(author.pk, 'posts_count', size)
+            missing -= size
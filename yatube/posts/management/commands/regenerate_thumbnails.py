@@ -0,0 +1,139 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import workers
+from posts.models import Post
+
+STATE_FILE = os.path.join(
+    tempfile.gettempdir(), 'yatube-regenerate-thumbnails.json')
+# Сколько ошибок показывать в отчёте
+REPORT_FAILURES = 20
+
+
+class InlineExecutor:
+    """Выполняет задачи сразу в текущем процессе (`--workers 0`)."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+
+class Command(BaseCommand):
+    help = ('Пересоздаёт варианты миниатюр всех картинок постов в пуле '
+            'процессов. Прерванный запуск продолжается с места остановки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов; 0 — работать в текущем процессе.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=200,
+            help='Сколько постов читать из БД за раз.')
+        parser.add_argument(
+            '--state-file', default=STATE_FILE,
+            help='Файл с отметкой о том, докуда дошёл прошлый запуск.')
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать сначала, не глядя на отметку прошлого запуска.')
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать и уже готовые миниатюры.')
+
+    def handle(self, *args, **options):
+        state = self.load_state(options['state_file'], options['restart'])
+        if state['last_pk']:
+            self.stdout.write(
+                f'Продолжаем после поста {state["last_pk"]}')
+        posts = Post.objects.exclude(image='').filter(
+            pk__gt=state['last_pk']).order_by('pk').values_list(
+            'pk', 'image')
+        started = time.monotonic()
+        processed = 0
+        with self.executor(options['workers']) as pool:
+            for chunk in self.chunks(posts, options['chunk_size']):
+                names = {name for pk, name in chunk}
+                futures = {
+                    name: pool.submit(
+                        workers.regenerate_thumbnails, name, options['force'])
+                    for name in names
+                }
+                for name, future in futures.items():
+                    error = future.exception()
+                    if error is None:
+                        state['failed'].pop(name, None)
+                    else:
+                        state['failed'][name] = repr(error)
+                processed += len(names)
+                state['last_pk'] = chunk[-1][0]
+                state['processed'] += len(names)
+                self.save_state(options['state_file'], state)
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'Обработано {processed} картинок, '
+                    f'{processed / elapsed:.1f} в секунду')
+        self.report(state, processed, time.monotonic() - started)
+        os.remove(options['state_file'])
+
+    def executor(self, processes):
+        if not processes:
+            return InlineExecutor()
+        # Дочерние процессы открывают свои соединения с БД
+        connections.close_all()
+        return ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=workers.init,
+        )
+
+    def chunks(self, posts, size):
+        """Пачки по `size` постов по возрастанию pk.
+
+        Каждая пачка — отдельный запрос от последнего pk: открытый на
+        весь проход курсор держал бы блокировку чтения, и в SQLite
+        дочерние процессы не смогли бы записать миниатюры.
+        """
+        last_pk = 0
+        while True:
+            chunk = list(posts.filter(pk__gt=last_pk)[:size].iterator())
+            if not chunk:
+                return
+            yield chunk
+            last_pk = chunk[-1][0]
+
+    def load_state(self, path, restart):
+        if not restart and os.path.exists(path):
+            with open(path) as file:
+                return json.load(file)
+        return {'last_pk': 0, 'processed': 0, 'failed': {}}
+
+    def save_state(self, path, state):
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(state, file)
+        os.replace(temporary, path)
+
+    def report(self, state, processed, elapsed):
+        rate = processed / elapsed if elapsed else 0
+        self.stdout.write(
+            f'Готово: в этом запуске {processed} картинок за '
+            f'{elapsed:.1f} с ({rate:.1f} в секунду), '
+            f'всего {state["processed"]}, ошибок {len(state["failed"])}')
+        for name, error in list(state['failed'].items())[:REPORT_FAILURES]:
+            self.stdout.write(f'  {name}: {error}')
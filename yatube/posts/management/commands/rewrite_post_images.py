@@ -0,0 +1,76 @@
+import os
+import shutil
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from posts import caching
+from posts.models import Post
+from posts.signals import post_cache_scopes
+
+
+class Command(BaseCommand):
+    help = ('Переименовывает картинки постов, загруженные до хранилища '
+            'с адресацией по содержимому, в имена по хешу и удаляет '
+            'дубликаты.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать, ничего не меняя.')
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        names = Post.objects.exclude(image='').values_list(
+            'image', flat=True).distinct().order_by('image')
+        stats = {'renamed': 0, 'duplicates': 0, 'missing': 0, 'freed': 0}
+        for name in names.iterator():
+            if storage.is_content_name(name):
+                continue
+            try:
+                with storage.open(name) as content:
+                    new_name = storage.content_name(name, content)
+            except FileNotFoundError:
+                stats['missing'] += 1
+                continue
+            duplicate = storage.exists(new_name)
+            stats['duplicates' if duplicate else 'renamed'] += 1
+            if duplicate:
+                stats['freed'] += storage.size(name)
+            if not options['dry_run']:
+                self.rewrite(storage, name, new_name, duplicate)
+        self.stdout.write(
+            f'Переименовано {stats["renamed"]}, '
+            f'дубликатов {stats["duplicates"]}, '
+            f'нет файла {stats["missing"]}, '
+            f'освобождено {stats["freed"]} байт'
+        )
+
+    def rewrite(self, storage, name, new_name, duplicate):
+        """Переносит файл под новое имя без копирования данных.
+
+        Файл под новым именем появляется раньше, чем на него начинают
+        ссылаться посты, а старый удаляется последним — прерванный
+        запуск ничего не теряет и продолжается повторным.
+        """
+        if not duplicate:
+            os.makedirs(os.path.dirname(storage.path(new_name)),
+                        exist_ok=True)
+            try:
+                os.link(storage.path(name), storage.path(new_name))
+            except OSError:
+                shutil.copyfile(storage.path(name), storage.path(new_name))
+        posts = Post.objects.filter(image=name).select_related(
+            'author', 'group')
+        scopes = set()
+        for post in posts:
+            scopes.update(post_cache_scopes(post))
+        # update() без сигналов: новая дата изменения меняет ключи
+        # закешированных карточек со старыми адресами картинок
+        posts.update(image=new_name, modified=timezone.now())
+        caching.invalidate(*scopes)
+        # Миниатюры старого имени больше не нужны
+        default.kvstore.delete(ImageFile(name, storage))
+        storage.delete(name)
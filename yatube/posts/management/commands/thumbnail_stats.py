@@ -0,0 +1,60 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+def file_size(storage, name):
+    try:
+        return storage.size(name)
+    except OSError:
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает размер вариантов миниатюр с исходными картинками '
+            'постов: сколько байт экономит каждый вариант.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=None,
+            help='Проверить только столько последних постов с картинками.')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').only(
+            'id', 'image').order_by('-id')
+        if options['limit']:
+            posts = posts[:options['limit']]
+        originals = Counter()
+        variants = Counter()
+        ready = Counter()
+        for post in posts.iterator():
+            original = file_size(post.image.storage, post.image.name)
+            if original is None:
+                continue
+            for name in thumbnails.VARIANTS:
+                thumbnail = thumbnails.get(post.image, name)
+                if thumbnail is None:
+                    continue
+                size = file_size(thumbnail.storage, thumbnail.name)
+                if size is None:
+                    continue
+                ready[name] += 1
+                originals[name] += original
+                variants[name] += size
+        for name in thumbnails.VARIANTS:
+            self.report(name, ready[name], originals[name], variants[name])
+
+    def report(self, name, ready, originals, variants):
+        if not ready:
+            self.stdout.write(f'{name}: нет готовых миниатюр')
+            return
+        saved = originals - variants
+        self.stdout.write(
+            f'{name}: миниатюр {ready}, '
+            f'в среднем {variants // ready} байт, '
+            f'сэкономлено {saved} байт '
+            f'({saved * 100 / originals:.1f}%)'
+        )
@@ -0,0 +1,310 @@
+import base64
+import binascii
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+COUNT_KEY = 'posts:count:{}'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage(Page):
+    """Страница ленты, полученная по курсору (без OFFSET и COUNT).
+
+    Совместима с шаблоном posts/includes/paginator.html: вместо номеров
+    страниц содержит непрозрачные токены соседних страниц.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous,
+                 rows=None):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+        # Строки выборки, из которых получены объекты страницы: токены
+        # кодируют ключи первой и последней из них
+        self._rows = object_list if rows is None else rows
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_token(self):
+        if self._has_next:
+            return self.paginator.encode(self._rows[-1])
+
+    @property
+    def previous_token(self):
+        if self._has_previous:
+            return self.paginator.encode(self._rows[0])
+
+
+class CursorPaginator:
+    """Keyset-пагинация по паре полей (по умолчанию `-pub_date`, `-id`).
+
+    Каждая страница — это один запрос с условием на ключ последней
+    записи и LIMIT, поэтому время выборки не зависит от глубины.
+
+    `transform` превращает строки страницы в её объекты: например,
+    выборка идёт по таблице тегов постов, а на странице — сами посты.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id'),
+                 transform=None):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.ordering = ordering
+        self.fields = [field.lstrip('-') for field in ordering]
+        self.transform = transform
+
+    def encode(self, obj):
+        values = [str(getattr(obj, field)) for field in self.fields]
+        raw = '|'.join(values).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode(self, token):
+        try:
+            padding = '=' * (-len(token) % 4)
+            raw = base64.urlsafe_b64decode(token + padding).decode()
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise InvalidCursor(token)
+        values = raw.split('|')
+        if len(values) != len(self.fields):
+            raise InvalidCursor(token)
+        return [self._parse(field, value)
+                for field, value in zip(self.fields, values)]
+
+    def _parse(self, field, value):
+        internal_type = (
+            self.object_list.model._meta.get_field(field).get_internal_type()
+        )
+        try:
+            if internal_type == 'DateTimeField':
+                parsed = parse_datetime(value)
+                if parsed is None:
+                    raise ValueError(value)
+                return parsed
+            if internal_type in ('AutoField', 'IntegerField', 'ForeignKey'):
+                return int(value)
+        except ValueError:
+            raise InvalidCursor(value)
+        return value
+
+    def _seek(self, values, forward):
+        """Условие «строго после ключа» в порядке ленты (или до него)."""
+        condition = Q()
+        equal = {}
+        for field, order, value in zip(self.fields, self.ordering, values):
+            descending = order.startswith('-') == forward
+            lookup = 'lt' if descending else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return condition
+
+    def _reversed(self):
+        return [field[1:] if field.startswith('-') else '-' + field
+                for field in self.ordering]
+
+    def page(self, after=None, before=None):
+        queryset = self.object_list
+        if before is not None:
+            queryset = queryset.filter(self._seek(self.decode(before), False))
+            rows = list(queryset.order_by(*self._reversed())
+                        [:self.per_page + 1])
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            return self._page(rows, True, has_previous)
+        if after is not None:
+            queryset = queryset.filter(self._seek(self.decode(after), True))
+        rows = list(queryset.order_by(*self.ordering)[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return self._page(rows[:self.per_page], has_next, after is not None)
+
+    def page_from(self, obj):
+        """Страница, которая начинается с объекта `obj` выборки."""
+        values = [getattr(obj, field) for field in self.fields]
+        queryset = self.object_list.filter(
+            self._seek(values, True) | Q(**dict(zip(self.fields, values))))
+        rows = list(queryset.order_by(*self.ordering)[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        has_previous = self.object_list.filter(
+            self._seek(values, False)).exists()
+        return self._page(rows[:self.per_page], has_next, has_previous)
+
+    def _page(self, rows, has_next, has_previous):
+        if self.transform is None:
+            return CursorPage(rows, self, has_next, has_previous)
+        return CursorPage(self.transform(rows), self, has_next,
+                          has_previous, rows)
+
+
+def estimate_count(queryset):
+    """Число строк таблицы по статистике СУБД, без COUNT(*).
+
+    Годится только для выборки без условий; для остальных и при
+    отсутствии статистики возвращает None.
+    """
+    query = queryset.query
+    if query.where or query.distinct or query.combinator:
+        return None
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = %s::regclass', [table])
+        elif connection.vendor == 'sqlite':
+            # sqlite_stat1 появляется только после ANALYZE
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute(
+                'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate > 0 else None
+
+
+def cached_count(queryset):
+    """COUNT(*) выборки, который пересчитывается раз в
+    COUNT_CACHE_TIMEOUT секунд."""
+    sql = str(queryset.query).encode()
+    key = COUNT_KEY.format(hashlib.md5(sql).hexdigest())
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.COUNT_CACHE_TIMEOUT)
+    return count
+
+
+class ApproximatePage(Page):
+    """Страница пагинатора с приблизительным числом записей.
+
+    Есть ли следующая страница, выясняется по самим записям, а не по
+    общему их числу.
+    """
+
+    def has_next(self):
+        if len(self.object_list) < self.paginator.per_page:
+            return False
+        bottom = self.number * self.paginator.per_page
+        return self.paginator.object_list[bottom:bottom + 1].exists()
+
+
+class ApproximateCountPaginator(Paginator):
+    """Пагинатор, который не считает большие выборки точно.
+
+    До EXACT_COUNT_LIMIT записей число считается ограниченным
+    COUNT(*) по подзапросу с LIMIT. Выше порога берётся оценка из
+    статистики СУБД (для выборки без условий) или закешированный
+    COUNT(*), а `approximate` становится True: шаблон показывает
+    «много страниц» вместо номера последней.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.exact_count_limit = settings.EXACT_COUNT_LIMIT
+        self._approximate = False
+
+    @cached_property
+    def count(self):
+        limit = self.exact_count_limit
+        bounded = self.object_list[:limit + 1].count()
+        if bounded <= limit:
+            return bounded
+        self._approximate = True
+        estimate = estimate_count(self.object_list)
+        if estimate is not None and estimate > limit:
+            return estimate
+        return max(cached_count(self.object_list), bounded)
+
+    @property
+    def approximate(self):
+        self.count
+        return self._approximate
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            # Оценка может быть меньше настоящего числа записей:
+            # страницы за «последней» проверяются самой выборкой
+            if not self.approximate or int(number) < 1:
+                raise
+            return int(number)
+
+    def page(self, number):
+        if not self.approximate:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        # Срез остаётся QuerySet: так его ждут формы list_editable
+        # в админке
+        object_list = self.object_list[bottom:bottom + self.per_page]
+        if number > 1 and not object_list:
+            raise EmptyPage('На этой странице нет записей')
+        return ApproximatePage(object_list, number, self)
+
+    def get_page(self, number):
+        try:
+            return super().get_page(number)
+        except EmptyPage:
+            # Оценка оказалась больше настоящего числа записей
+            return self.page(1)
+
+
+def get_cursor_page(request, paginator):
+    """Страница курсорного пагинатора по `?after=`/`?before=`.
+
+    Без курсора или с испорченным курсором возвращается первая.
+    """
+    after = request.GET.get('after') or None
+    before = request.GET.get('before') or None
+    try:
+        return paginator.page(after=after, before=before)
+    except InvalidCursor:
+        return paginator.page()
+
+
+def get_page(request, post_list, per_page, ordering=('-pub_date', '-id'),
+             transform=None):
+    """Возвращает страницу ленты для запроса.
+
+    Параметры `?after=`/`?before=` включают курсорный режим, иначе
+    используется обычный постраничный `?page=N`. `ordering` и
+    `transform` — как у CursorPaginator; в постраничном режиме
+    `post_list` уже должен быть упорядочен.
+    """
+    if request.GET.get('after') or request.GET.get('before'):
+        return get_cursor_page(request, CursorPaginator(
+            post_list, per_page, ordering=ordering, transform=transform))
+    paginator = ApproximateCountPaginator(post_list, per_page)
+    page = paginator.get_page(request.GET.get('page'))
+    if transform is not None:
+        page.object_list = transform(page.object_list)
+    return page
@@ -0,0 +1,166 @@
+"""Полнотекстовый поиск по постам.
+
+В SQLite текст постов индексируется виртуальной таблицей FTS5
+posts_post_fts с внешним содержимым: сам текст хранится только в
+posts_post, а индекс синхронизируют триггеры — они срабатывают и на
+bulk_create, и на update(), в обход сигналов. Результаты упорядочены по
+релевантности (bm25), а при равной — новые выше.
+
+На других СУБД поиск сводится к LIKE по всем словам запроса.
+"""
+import re
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+# Запрос разбивается на слова так же, как текст токенизатором unicode61
+WORD_RE = re.compile(r'\w+')
+MAX_WORDS = 10
+
+TRIGGERS = {
+    'posts_post_fts_insert': f"""
+        CREATE TRIGGER IF NOT EXISTS posts_post_fts_insert
+        AFTER INSERT ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+        END
+    """,
+    'posts_post_fts_delete': f"""
+        CREATE TRIGGER IF NOT EXISTS posts_post_fts_delete
+        AFTER DELETE ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+        END
+    """,
+    'posts_post_fts_update': f"""
+        CREATE TRIGGER IF NOT EXISTS posts_post_fts_update
+        AFTER UPDATE OF text ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+            INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+        END
+    """,
+}
+
+
+def is_indexed(using='default'):
+    return connections[using].vendor == 'sqlite'
+
+
+def words(query):
+    return WORD_RE.findall(query.lower())[:MAX_WORDS]
+
+
+def match_expression(query):
+    """Выражение MATCH: все слова запроса, каждое — как префикс.
+
+    Слова берутся в кавычки, поэтому операторы FTS5 в запросе
+    пользователя (NEAR, OR, «*») ищутся как обычный текст.
+    """
+    return ' '.join(f'"{word}"*' for word in words(query))
+
+
+def restore_triggers(using='default'):
+    """Пересоздаёт триггеры индекса, если их нет, и перестраивает индекс.
+
+    Изменение таблицы постов в миграциях SQLite делает через её
+    пересоздание, и триггеры старой таблицы удаляются вместе с ней.
+    """
+    if not is_indexed(using):
+        return False
+    with connections[using].cursor() as cursor:
+        cursor.execute('SELECT name FROM sqlite_master')
+        existing = {row[0] for row in cursor.fetchall()}
+        if FTS_TABLE not in existing:
+            # Миграция с индексом ещё не применена
+            return False
+        missing = [name for name in TRIGGERS if name not in existing]
+        if not missing:
+            return False
+        for name in missing:
+            cursor.execute(TRIGGERS[name])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return True
+
+
+def filter_posts(queryset, query):
+    """Посты выборки, подходящие под запрос (без упорядочивания)."""
+    if not words(query):
+        return queryset.none()
+    if not is_indexed(queryset.db):
+        for word in words(query):
+            queryset = queryset.filter(text__icontains=word)
+        return queryset
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [match_expression(query)],
+    ))
+
+
+class SearchResults:
+    """Найденные посты в порядке релевантности.
+
+    Поддерживает count() и срезы — этого достаточно Paginator. Срез
+    выбирает из индекса только id постов страницы, а сами посты
+    догружает одним запросом.
+    """
+
+    def __init__(self, query, using='default'):
+        self.query = query
+        self.using = using
+        self.expression = match_expression(query)
+        self.posts = Post.objects.using(using).select_related(
+            'author', 'group')
+
+    def count(self):
+        if not self.expression:
+            return 0
+        if not is_indexed(self.using):
+            return filter_posts(self.posts, self.query).count()
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s', [self.expression])
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def ids(self, offset, limit):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                'ORDER BY rank, rowid DESC LIMIT %s OFFSET %s',
+                [self.expression, limit, offset])
+            return [row[0] for row in cursor.fetchall()]
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            raise TypeError('SearchResults поддерживает только срезы')
+        offset = key.start or 0
+        limit = key.stop - offset
+        if not self.expression or limit <= 0:
+            return []
+        if not is_indexed(self.using):
+            return list(filter_posts(self.posts, self.query).order_by(
+                '-pub_date', '-id')[offset:key.stop])
+        ids = self.ids(offset, limit)
+        posts = self.posts.in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+class SearchPaginator(Paginator):
+    """Пагинатор результатов поиска.
+
+    Число результатов точное, но при больших выдачах шаблон, как и
+    для ApproximateCountPaginator, не перечисляет номера всех страниц.
+    """
+
+    @property
+    def approximate(self):
+        return self.count > settings.EXACT_COUNT_LIMIT
@@ -0,0 +1,193 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (
+    post_delete, post_migrate, post_save, pre_delete, pre_save)
+from django.dispatch import receiver
+
+from . import (autocomplete, caching, counters, follow_graph, search, tags,
+               threads, timeline)
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user(instance.author_id, 'posts_count', 1)
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Post)
+def index_post_tags(sender, instance, created, **kwargs):
+    if created or instance.text != getattr(instance, '_old_text', None):
+        tags.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        counters.change_post(instance.post_id, 1)
+        if not instance.path:
+            threads.assign_path(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user(instance.author_id, 'followers_count', 1)
+        counters.change_user(instance.user_id, 'following_count', 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'followers_count', -1)
+    counters.change_user(instance.user_id, 'following_count', -1)
+    timeline.prune(instance.user_id, instance.author_id)
+    timeline.catch_up(instance.author_id)
+
+
+def post_cache_scopes(post):
+    scopes = [
+        caching.index_scope(),
+        caching.post_scope(post.pk),
+        caching.profile_scope(post.author.username),
+    ]
+    if post.group_id:
+        scopes.append(caching.group_scope(post.group.slug))
+    return scopes
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_post(sender, instance, **kwargs):
+    if instance.pk:
+        old = Post.objects.filter(pk=instance.pk).select_related(
+            'author', 'group').first()
+        instance._old_cache_scopes = post_cache_scopes(old) if old else []
+        instance._old_text = old.text if old else None
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    old_scopes = getattr(instance, '_old_cache_scopes', [])
+    caching.invalidate(*old_scopes, *post_cache_scopes(instance))
+
+
+def comment_cache_scopes(post_id):
+    """Области страниц, где видно число комментариев поста: кроме
+    страницы поста, это ленты с его карточкой."""
+    post = Post.objects.filter(pk=post_id).select_related(
+        'author', 'group').first()
+    if post is None:
+        return [caching.post_scope(post_id)]
+    return post_cache_scopes(post)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, created=True, **kwargs):
+    # Правка комментария число комментариев не меняет
+    if created:
+        caching.invalidate(*comment_cache_scopes(instance.post_id))
+    else:
+        caching.invalidate(caching.post_scope(instance.post_id))
+
+
+def group_author_scopes(group):
+    """Профили авторов, в чьих карточках есть ссылка на группу."""
+    usernames = User.objects.filter(posts__group=group).values_list(
+        'username', flat=True).distinct()
+    return [caching.profile_scope(username) for username in usernames]
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_slug(sender, instance, **kwargs):
+    if instance.pk:
+        instance._old_slug = Group.objects.filter(
+            pk=instance.pk).values_list('slug', flat=True).first()
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_authors(sender, instance, **kwargs):
+    # После удаления у постов уже не будет группы
+    instance._author_scopes = group_author_scopes(instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_pages(sender, instance, **kwargs):
+    author_scopes = getattr(instance, '_author_scopes', None)
+    if author_scopes is None:
+        author_scopes = group_author_scopes(instance)
+    caching.invalidate(
+        caching.index_scope(),
+        caching.group_scope(instance.slug),
+        caching.group_scope(getattr(instance, '_old_slug', instance.slug)),
+        *author_scopes,
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_pages(sender, instance, created, update_fields=None,
+                            **kwargs):
+    """Имя автора выводится в карточках его постов на главной, в
+    профиле и в группах."""
+    if created or update_fields and not (
+            autocomplete.USER_FIELDS & set(update_fields)):
+        return
+    group_slugs = Group.objects.filter(
+        post__author=instance).values_list('slug', flat=True).distinct()
+    caching.invalidate(
+        caching.index_scope(),
+        caching.profile_scope(instance.username),
+        *map(caching.group_scope, group_slugs),
+    )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_profile_page(sender, instance, **kwargs):
+    caching.invalidate(caching.profile_scope(instance.author.username))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_followees(sender, instance, **kwargs):
+    follow_graph.invalidate(instance.user_id)
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    if sender.name == 'posts':
+        search.restore_triggers(using)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not autocomplete.USER_FIELDS & set(update_fields):
+        return
+    autocomplete.changed(autocomplete.USER, instance.pk)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    autocomplete.changed(autocomplete.GROUP, instance.pk)
@@ -0,0 +1,148 @@
+"""Хештеги и упоминания в текстах постов.
+
+При сохранении поста из текста извлекаются `#теги` и `@имена`
+пользователей и записываются в таблицы PostTag и Mention вместе с
+датой поста. Лента тега или упоминаний пользователя — это диапазон по
+индексу (тег, дата) или (пользователь, дата), а не поиск по текстам
+всех постов.
+
+Теги хранятся в нижнем регистре; упоминания — только существующих
+пользователей, а имена сравниваются с учётом регистра, как при входе.
+"""
+import re
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils.html import escape
+
+from .models import Mention, PostTag, Tag
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+TAG_LENGTH = Tag._meta.get_field('name').max_length
+# Тег — слово после «#», упоминание — имя пользователя после «@»; знак
+# в середине слова (a#b, почта a@b.ru) тегом и упоминанием не считается.
+# Точка в конце имени — конец предложения, а не часть имени.
+TAG_RE = re.compile(r'(?<![\w#@])#(\w+)')
+MENTION_RE = re.compile(r'(?<![\w#@.+-])@([\w.@+-]*[\w@+-])')
+TOKEN_RE = re.compile(f'{TAG_RE.pattern}|{MENTION_RE.pattern}')
+
+
+def tag_names(text):
+    """Теги текста без повторов, в порядке появления."""
+    names = (name.casefold() for name in TAG_RE.findall(text))
+    return list(dict.fromkeys(
+        name for name in names if len(name) <= TAG_LENGTH))
+
+
+def mentioned_usernames(text):
+    return list(dict.fromkeys(MENTION_RE.findall(text)))
+
+
+def get_tags(names):
+    """Теги с такими именами, недостающие создаются: имя → id."""
+    if not names:
+        return {}
+    Tag.objects.bulk_create(
+        [Tag(name=name) for name in names],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    return dict(Tag.objects.filter(name__in=names).values_list('name', 'pk'))
+
+
+def get_user_ids(usernames):
+    if not usernames:
+        return {}
+    return dict(User.objects.filter(
+        username__in=usernames).values_list('username', 'pk'))
+
+
+def index_post(post):
+    """Приводит теги и упоминания поста в соответствие с его текстом."""
+    tag_ids = list(get_tags(tag_names(post.text)).values())
+    user_ids = list(get_user_ids(mentioned_usernames(post.text)).values())
+    PostTag.objects.filter(post=post).exclude(tag_id__in=tag_ids).delete()
+    Mention.objects.filter(post=post).exclude(user_id__in=user_ids).delete()
+    PostTag.objects.bulk_create(
+        [PostTag(post=post, tag_id=tag_id, pub_date=post.pub_date)
+         for tag_id in tag_ids],
+        ignore_conflicts=True,
+    )
+    Mention.objects.bulk_create(
+        [Mention(post=post, user_id=user_id, pub_date=post.pub_date)
+         for user_id in user_ids],
+        ignore_conflicts=True,
+    )
+
+
+def index_posts(posts):
+    """Добавляет теги и упоминания пачки постов несколькими запросами.
+
+    Только дополняет индекс: используется для заполнения по уже
+    существующим постам, где лишних записей нет.
+    """
+    found = [
+        (post, tag_names(post.text), mentioned_usernames(post.text))
+        for post in posts
+    ]
+    tag_ids = get_tags(list({name for _, names, _ in found
+                             for name in names}))
+    user_ids = get_user_ids(list({username for _, _, usernames in found
+                                  for username in usernames}))
+    post_tags = []
+    mentions = []
+    for post, names, usernames in found:
+        post_tags.extend(
+            PostTag(post=post, tag_id=tag_ids[name], pub_date=post.pub_date)
+            for name in names
+        )
+        mentions.extend(
+            Mention(post=post, user_id=user_ids[username],
+                    pub_date=post.pub_date)
+            for username in usernames if username in user_ids
+        )
+    PostTag.objects.bulk_create(
+        post_tags, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    Mention.objects.bulk_create(
+        mentions, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    return len(post_tags), len(mentions)
+
+
+def tagged_rows(tag):
+    """Строки ленты тега; посты берутся из них без отдельных запросов."""
+    return PostTag.objects.filter(tag=tag).select_related(
+        'post__author', 'post__group')
+
+
+def mention_rows(user):
+    return Mention.objects.filter(user=user).select_related(
+        'post__author', 'post__group')
+
+
+def posts_of(rows):
+    return [row.post for row in rows]
+
+
+def linkify(text):
+    """Текст поста в HTML со ссылками на теги и профили упомянутых.
+
+    Ссылки строятся по самому тексту, без запросов, поэтому упоминание
+    несуществующего пользователя тоже становится ссылкой — на 404.
+    """
+    parts = []
+    position = 0
+    for match in TOKEN_RE.finditer(text):
+        tag, username = match.groups()
+        if tag is not None and len(tag) > TAG_LENGTH:
+            continue
+        if tag is not None:
+            url = reverse('posts:tag_posts', args=[tag.casefold()])
+        else:
+            url = reverse('posts:profile', args=[username])
+        parts.append(escape(text[position:match.start()]))
+        parts.append(f'<a href="{escape(url)}">{escape(match.group())}</a>')
+        position = match.end()
+    parts.append(escape(text[position:]))
+    return ''.join(parts)
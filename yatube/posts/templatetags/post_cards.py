@@ -0,0 +1,66 @@
+import hashlib
+
+from django import template
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts import follow_graph
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+CARD_TIMEOUT = 60 * 60 * 24
+FOLLOWING_MARK = '<p class="text-muted">Вы подписаны на автора</p>'
+
+
+def card_key(post):
+    """Ключ карточки: id поста, версия его изменений и отпечаток
+    автора и группы, которые тоже выводятся в карточке.
+
+    Переименование автора или группы и удаление группы (SET_NULL —
+    UPDATE без сигналов поста) не меняют `modified`, но меняют
+    отпечаток.
+    """
+    group_slug = post.group.slug if post.group_id else ''
+    related = '\0'.join(
+        (post.author.username, post.author.get_full_name(), group_slug))
+    stamp = hashlib.md5(related.encode()).hexdigest()[:12]
+    return (
+        f'posts:card:{post.pk}:{post.modified.timestamp()}:'
+        f'{post.comments_count}:{stamp}'
+    )
+
+
+@register.simple_tag
+def post_cards(posts, user=None):
+    """Отрендеренные карточки постов страницы из кеша фрагментов.
+
+    Все карточки страницы запрашиваются из кеша одним get_many;
+    недостающие рендерятся и сохраняются одним set_many. Карточки с
+    заглушкой вместо ещё не готовой миниатюры не сохраняются.
+
+    Если передан `user`, карточки авторов, на которых он подписан,
+    получают отметку; она добавляется поверх общей закешированной
+    карточки, а подписки проверяются одним чтением графа подписок.
+    """
+    posts = list(posts)
+    keys = [card_key(post) for post in posts]
+    cards = cache.get_many(keys)
+    missing = {}
+    for post, key in zip(posts, keys):
+        if key not in cards:
+            cards[key] = render_to_string(CARD_TEMPLATE, {'post': post})
+            if not getattr(post, 'thumbnail_pending', False):
+                missing[key] = cards[key]
+    if missing:
+        cache.set_many(missing, CARD_TIMEOUT)
+    followed = set()
+    if user is not None:
+        followed = follow_graph.followed_among(
+            user, {post.author_id for post in posts})
+    return [
+        mark_safe(FOLLOWING_MARK + cards[key])
+        if post.author_id in followed else mark_safe(cards[key])
+        for post, key in zip(posts, keys)
+    ]
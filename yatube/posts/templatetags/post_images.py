@@ -0,0 +1,25 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def ready_image(image):
+    """Готовые варианты картинки поста (ResponsiveImage) или None.
+
+    Если вариантов ещё нет, их генерация ставится в очередь, а пост
+    помечается `thumbnail_pending`, чтобы карточку с заглушкой не
+    сохранили в кеш фрагментов.
+    """
+    if not image:
+        return None
+    responsive = thumbnails.get_responsive(image)
+    if responsive is None:
+        thumbnails.schedule(image.instance)
+        # При THUMBNAIL_WORKERS = 0 варианты уже готовы
+        responsive = thumbnails.get_responsive(image)
+    if responsive is None:
+        image.instance.thumbnail_pending = True
+    return responsive
@@ -0,0 +1,12 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts import tags
+
+register = template.Library()
+
+
+@register.filter
+def linkify(text):
+    """Текст поста со ссылками на ленты тегов и профили упомянутых."""
+    return mark_safe(tags.linkify(text))
@@ -0,0 +1,145 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Max, Min
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.admin import IndexedDatesQuerySet
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class PostAdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin')
+        cls.author = User.objects.create_user(username='Author')
+        Group.objects.bulk_create(
+            Group(title=f'Группа {i}', slug=f'group-{i}', description='')
+            for i in range(30)
+        )
+        cls.group = Group.objects.first()
+        dates = [
+            datetime.datetime(2021, 3, 5, 10, tzinfo=timezone.utc),
+            datetime.datetime(2021, 3, 9, 23, tzinfo=timezone.utc),
+            datetime.datetime(2021, 12, 31, 23, tzinfo=timezone.utc),
+            datetime.datetime(2023, 1, 1, 0, tzinfo=timezone.utc),
+        ]
+        for date in dates:
+            post = Post.objects.create(
+                author=cls.author, group=cls.group, text='Текст')
+            Post.objects.filter(pk=post.pk).update(pub_date=date)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def get_changelist(self, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('admin:posts_post_changelist'), params or {})
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_queries_do_not_grow_with_rows(self):
+        """Число запросов списка постов не зависит от числа строк."""
+        _, before = self.get_changelist()
+        first = Post.objects.order_by('pub_date').first()
+        for _ in range(20):
+            post = Post.objects.create(
+                author=self.author, group=self.group, text='Текст')
+            # В тот же день, чтобы не менялся список дат date_hierarchy
+            Post.objects.filter(pk=post.pk).update(pub_date=first.pub_date)
+        _, after = self.get_changelist()
+        self.assertEqual(before, after)
+
+    def test_group_is_autocomplete(self):
+        """Группа в строках списка — поле с автодополнением, а не список
+        всех групп."""
+        response, _ = self.get_changelist()
+        self.assertContains(response, 'admin-autocomplete')
+        # В <select> только выбранная группа
+        self.assertContains(response, 'Группа 0')
+        self.assertNotContains(response, 'Группа 29')
+
+    def test_list_editable_saves_group(self):
+        """Группу можно сменить прямо в списке постов."""
+        post = Post.objects.first()
+        group = Group.objects.get(slug='group-29')
+        response = self.client.post(
+            reverse('admin:posts_post_changelist'), {
+                'form-TOTAL_FORMS': 1,
+                'form-INITIAL_FORMS': 1,
+                'form-0-id': post.pk,
+                'form-0-group': group.pk,
+                '_save': 'Сохранить',
+            })
+        self.assertEqual(response.status_code, 302)
+        post.refresh_from_db()
+        self.assertEqual(post.group, group)
+
+    def test_date_hierarchy_levels(self):
+        """Уровни date_hierarchy совпадают с QuerySet.dates()."""
+        indexed = IndexedDatesQuerySet(model=Post)
+        for kind in ('year', 'month', 'day'):
+            for order in ('ASC', 'DESC'):
+                with self.subTest(kind=kind, order=order):
+                    self.assertEqual(
+                        indexed.dates('pub_date', kind, order),
+                        list(Post.objects.dates('pub_date', kind, order)),
+                    )
+        in_2021 = indexed.filter(pub_date__year=2021)
+        self.assertEqual(
+            in_2021.dates('pub_date', 'month'),
+            list(Post.objects.filter(
+                pub_date__year=2021).dates('pub_date', 'month')),
+        )
+        self.assertEqual(
+            indexed.aggregate(first=Min('pub_date'), last=Max('pub_date')),
+            Post.objects.aggregate(
+                first=Min('pub_date'), last=Max('pub_date')),
+        )
+
+    def test_date_hierarchy_drilldown(self):
+        """Переходы по date_hierarchy показывают посты периода."""
+        response, _ = self.get_changelist({'pub_date__year': 2021})
+        self.assertEqual(response.context['cl'].result_count, 3)
+        response, _ = self.get_changelist(
+            {'pub_date__year': 2021, 'pub_date__month': 3})
+        self.assertEqual(response.context['cl'].result_count, 2)
+
+
+class RelatedAdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin')
+        cls.author = User.objects.create_user(username='Author')
+        cls.post = Post.objects.create(author=cls.author, text='Текст')
+        cls.comment = Comment.objects.create(
+            post=cls.post, author=cls.admin, text='Комментарий')
+        cls.follow = Follow.objects.create(user=cls.admin, author=cls.author)
+
+    def test_comment_and_follow_admins(self):
+        """Комментарии и подписки есть в админке; связи задаются полями
+        id, а не списками всех постов и пользователей."""
+        client = Client()
+        client.force_login(self.admin)
+        for model, obj, fields in (('comment', self.comment, 3),
+                                   ('follow', self.follow, 2)):
+            with self.subTest(model=model):
+                response = client.get(
+                    reverse(f'admin:posts_{model}_changelist'))
+                self.assertEqual(response.status_code, 200)
+                response = client.get(
+                    reverse(f'admin:posts_{model}_change', args=[obj.pk]))
+                self.assertContains(
+                    response, 'vForeignKeyRawIdAdminField', count=fields)
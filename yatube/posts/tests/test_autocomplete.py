@@ -0,0 +1,114 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import autocomplete
+from posts.models import Group
+
+User = get_user_model()
+
+
+def labels(query, limit=10):
+    return [item['label'] for item in autocomplete.suggest(query, limit)]
+
+
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.anna = User.objects.create_user(
+            username='anna', first_name='Анна', last_name='Фёдорова')
+        cls.ivan = User.objects.create_user(username='ivan_petrov')
+        cls.group = Group.objects.create(
+            title='Клуб любителей кофе', slug='coffee', description='')
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(autocomplete, 'index',
+                                    autocomplete.Index())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_prefix_search(self):
+        """Подсказки ищутся по началу имени пользователя, имени, фамилии
+        и слов названия группы без учёта регистра и «ё»."""
+        cases = {
+            'an': ['Анна Фёдорова (anna)'],
+            'IVAN': ['ivan_petrov'],
+            'анна ф': ['Анна Фёдорова (anna)'],
+            'федор': ['Анна Фёдорова (anna)'],
+            'Кофе': ['Клуб любителей кофе'],
+            'клуб л': ['Клуб любителей кофе'],
+            'лю': ['Клуб любителей кофе'],
+            'нет такого': [],
+            '   ': [],
+        }
+        for query, expected in cases.items():
+            with self.subTest(query=query):
+                self.assertEqual(labels(query), expected)
+
+    def test_endpoint(self):
+        """Эндпоинт отдаёт JSON с адресами профилей и групп."""
+        for i in range(5):
+            User.objects.create_user(username=f'кофеман{i}')
+        response = Client().get(
+            reverse('posts:suggest'), {'q': 'ко', 'limit': 3})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(results[0], {
+            'type': 'group',
+            'label': 'Клуб любителей кофе',
+            'url': reverse('posts:group_list', args=['coffee']),
+        })
+        self.assertEqual(len(results), 3)
+        response = Client().get(reverse('posts:suggest'), {'q': 'кофеман0'})
+        self.assertEqual(response.json()['results'][0]['url'],
+                         reverse('posts:profile', args=['кофеман0']))
+
+    def test_incremental_updates(self):
+        """Изменения подхватываются без перестроения индекса: перед
+        поиском перечитывается только изменённый объект."""
+        labels('a')
+        boris = User.objects.create_user(username='boris')
+        with self.assertNumQueries(1):
+            self.assertEqual(labels('bor'), ['boris'])
+        boris.username = 'vladimir'
+        boris.save()
+        self.assertEqual(labels('bor'), [])
+        self.assertEqual(labels('vlad'), ['vladimir'])
+        self.group.title = 'Чайный клуб'
+        self.group.save()
+        self.assertEqual(labels('кофе'), [])
+        self.assertEqual(labels('чай'), ['Чайный клуб'])
+        boris.delete()
+        self.assertEqual(labels('vlad'), [])
+        with self.assertNumQueries(0):
+            labels('vlad')
+
+    def test_login_does_not_touch_index(self):
+        """Вход пользователя (сохранение last_login) не пишет в журнал."""
+        labels('a')
+        version = cache.get(autocomplete.VERSION_KEY)
+        update_last_login(None, self.anna)
+        self.assertEqual(cache.get(autocomplete.VERSION_KEY), version)
+
+    def test_compaction(self):
+        """Накопленные изменения вливаются в основной индекс."""
+        labels('a')
+        with mock.patch.object(autocomplete, 'COMPACT_SIZE', 2):
+            for name in ('bob', 'bill', 'ben'):
+                User.objects.create_user(username=name)
+            self.assertEqual(labels('b'), ['ben', 'bill', 'bob'])
+        self.assertEqual(autocomplete.index.delta, [])
+        self.assertIn('bob', autocomplete.index.keys)
+
+    def test_lost_journal(self):
+        """Если журнал пропал, индекс строится заново."""
+        labels('a')
+        User.objects.create_user(username='boris')
+        cache.clear()
+        self.assertEqual(labels('bor'), ['boris'])
@@ -0,0 +1,59 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from posts import caching
+
+
+class StampedeProtectionTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+        @caching.cache_page_by_scopes(60, lambda: ['test'])
+        def view(request):
+            self.calls += 1
+            return HttpResponse(f'render {self.calls}')
+
+        self.view = view
+        self.request = RequestFactory().get('/page/')
+        self.key = caching.page_key(
+            self.request, caching.get_versions(['test']))
+
+    def expire(self):
+        entry = cache.get(self.key)
+        entry['expires'] = 0
+        cache.set(self.key, entry)
+
+    def test_stale_page_served_while_another_request_rebuilds(self):
+        """Пока страницу перестраивает другой запрос, отдаётся
+        устаревшая копия без повторного вызова представления."""
+        self.view(self.request)
+        self.expire()
+
+        cache.add(f'{self.key}:lock', True)
+        response = self.view(self.request)
+        self.assertEqual(response.content, b'render 1')
+        self.assertEqual(self.calls, 1)
+
+        cache.delete(f'{self.key}:lock')
+        response = self.view(self.request)
+        self.assertEqual(response.content, b'render 2')
+        self.assertEqual(self.view(self.request).content, b'render 2')
+        self.assertEqual(self.calls, 2)
+
+    def test_invalidated_scope_is_rebuilt(self):
+        """Инвалидация области даёт новую страницу."""
+        self.view(self.request)
+        caching.invalidate('test')
+        self.assertEqual(self.view(self.request).content, b'render 2')
+
+    def test_probabilistic_early_expiry(self):
+        """Долго строящаяся страница перестраивается до срока."""
+        entry = {'expires': 100, 'delta': 0.5}
+        with mock.patch('posts.caching.random.random', return_value=0.5):
+            self.assertTrue(caching.is_fresh(entry, beta=1, now=99))
+            entry['delta'] = 5
+            self.assertFalse(caching.is_fresh(entry, beta=1, now=99))
@@ -0,0 +1,149 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import caching, comment_buffer, signals, threads
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(COMMENT_BUFFER=True, COMMENT_BUFFER_WORKER=False)
+class CommentBufferTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.other_post = Post.objects.create(author=cls.author, text='Ещё')
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(comment_buffer.flush)
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def add(self, text, post=None, parent=None, client=None):
+        data = {'text': text}
+        if parent is not None:
+            data['parent'] = parent.pk
+        return (client or self.client).post(
+            reverse('posts:add_comment', args=[(post or self.post).pk]),
+            data)
+
+    def test_add_comment_only_queues(self):
+        """add_comment не пишет в БД, а автор сразу видит комментарий
+        на странице поста; другие — только после записи."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.add('Из очереди')
+        self.assertFalse(any(
+            query['sql'].startswith(('INSERT', 'UPDATE "posts_'))
+            for query in queries.captured_queries))
+        self.assertRedirects(
+            response,
+            reverse('posts:post_detail', args=[self.post.pk]) + '#comments',
+            fetch_redirect_response=False)
+        self.assertFalse(Comment.objects.exists())
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        self.assertContains(self.client.get(url), 'Из очереди')
+        reader = Client()
+        reader.force_login(self.reader)
+        self.assertNotContains(reader.get(url), 'Из очереди')
+
+        comment_buffer.flush()
+        comment = Comment.objects.get()
+        self.assertEqual(comment.path, threads.segment(comment.pk))
+        self.assertEqual(
+            comment_buffer.pending(self.post.pk, self.author), [])
+        self.assertContains(reader.get(url), f'id="comment-{comment.pk}"')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_queued_comment_keeps_page_cache_of_readers(self):
+        """Комментарий в очереди не сбрасывает кеш страниц: автор
+        получает новую страницу по своей cookie, а все страницы поста
+        и лент сбрасываются один раз — когда записана пачка."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        scopes = signals.post_cache_scopes(self.post)
+        reader = Client()
+        reader.get(url)
+        self.client.get(url)
+        versions = caching.get_versions(scopes)
+
+        self.add('Свой комментарий')
+        self.assertEqual(caching.get_versions(scopes), versions)
+        with self.assertNumQueries(0):
+            self.assertNotContains(reader.get(url), 'Свой комментарий')
+        self.assertContains(self.client.get(url), 'Свой комментарий')
+
+        comment_buffer.flush()
+        changed = caching.get_versions(scopes)
+        self.assertTrue(all(
+            new == old + 1 for new, old in zip(changed, versions)))
+        self.assertContains(reader.get(url), 'Свой комментарий')
+
+    def test_pending_comments_are_kept_separately(self):
+        """Ждущие комментарии хранятся по отдельности: запись одного не
+        теряет другой."""
+        self.add('Первый')
+        self.add('Второй')
+        first = comment_buffer._queue.get_nowait()
+        comment_buffer.write([first])
+        self.assertEqual(
+            [item['text'] for item in
+             comment_buffer.pending(self.post.pk, self.author)],
+            ['Второй'])
+
+    def test_flush_writes_batch_with_threads_and_counters(self):
+        """Пачка — одна вставка; ответы получают пути и глубину,
+        счётчики растут на число комментариев поста."""
+        root = Comment.objects.create(
+            post=self.post, author=self.author, text='Корень')
+        for i in range(30):
+            self.add(f'Ответ {i}', parent=root)
+            self.add(f'Комментарий {i}', post=self.other_post)
+        with CaptureQueriesContext(connection) as queries:
+            comment_buffer.flush()
+        inserts = [query for query in queries.captured_queries
+                   if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 2)
+        replies = Comment.objects.filter(parent=root)
+        self.assertEqual(replies.count(), 30)
+        for reply in replies:
+            self.assertEqual(reply.path, root.path + threads.segment(reply.pk))
+            self.assertEqual(reply.depth, 1)
+        self.assertEqual(
+            list(threads.subtree(root).values_list('text', flat=True)),
+            ['Корень'] + [f'Ответ {i}' for i in range(30)])
+        self.post.refresh_from_db()
+        self.other_post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 31)
+        self.assertEqual(self.other_post.comments_count, 30)
+
+    def test_comments_to_deleted_posts_are_dropped(self):
+        self.add('Пропадёт', post=self.other_post)
+        self.add('Останется')
+        Post.objects.filter(pk=self.other_post.pk).delete()
+        comment_buffer.flush()
+        self.assertEqual(
+            list(Comment.objects.values_list('text', flat=True)),
+            ['Останется'])
+
+    def test_failed_batch_falls_back_to_single_saves(self):
+        """Если пачку вставить не удалось, комментарии сохраняются по
+        одному."""
+        self.add('Первый')
+        self.add('Второй')
+        with mock.patch.object(
+                Comment.objects, 'bulk_create', side_effect=RuntimeError):
+            with self.assertLogs('posts.comment_buffer', 'ERROR'):
+                comment_buffer.flush()
+        self.assertEqual(Comment.objects.count(), 2)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 2)
@@ -0,0 +1,82 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import views
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+PAGE = views.COMMENTS_ON_PAGE
+MORE_URL = re.compile(r'data-url="([^"]+)"')
+
+
+class CommentPagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.texts = [f'Комментарий №{i}.' for i in range(PAGE * 2 + 5)]
+        for text in cls.texts:
+            Comment.objects.create(post=cls.post, author=cls.author, text=text)
+        cls.detail_url = reverse('posts:post_detail', args=[cls.post.pk])
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_detail_renders_first_chunk(self):
+        """На странице поста только первая порция комментариев."""
+        response = self.client.get(self.detail_url)
+        comments = response.context['comments']
+        self.assertEqual([c.text for c in comments], self.texts[:PAGE])
+        self.assertContains(response, self.texts[PAGE - 1])
+        self.assertNotContains(response, self.texts[PAGE])
+        self.assertContains(response, 'Показать ещё комментарии')
+
+    def test_chunks_cover_all_comments(self):
+        """Порции по ссылкам «Показать ещё» по порядку содержат все
+        комментарии по одному разу."""
+        html = self.client.get(self.detail_url).content.decode()
+        texts = re.findall(r'Комментарий №\d+\.', html)
+        chunks = 1
+        while MORE_URL.search(html):
+            url = MORE_URL.search(html).group(1).replace('&amp;', '&')
+            html = self.client.get(url).content.decode()
+            texts.extend(re.findall(r'Комментарий №\d+\.', html))
+            chunks += 1
+        self.assertEqual(texts, self.texts)
+        self.assertEqual(chunks, 3)
+
+    def test_chunk_queries(self):
+        """Порция комментариев — пост и одна выборка с авторами."""
+        url = reverse('posts:post_comments', args=[self.post.pk])
+        with self.assertNumQueries(2):
+            Client().get(url)
+
+    def test_add_comment_lands_on_comment(self):
+        """После отправки комментария пользователь видит его, даже если
+        он не в первой порции."""
+        response = self.client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Мой новый комментарий'})
+        comment = Comment.objects.get(text='Мой новый комментарий')
+        self.assertRedirects(
+            response,
+            f'{self.detail_url}?comment={comment.pk}#comment-{comment.pk}',
+            fetch_redirect_response=False,
+        )
+        response = self.client.get(response.url)
+        self.assertContains(response, f'id="comment-{comment.pk}"')
+        self.assertContains(response, 'Ранние комментарии')
+
+    def test_unknown_comment_shows_first_chunk(self):
+        response = self.client.get(self.detail_url, {'comment': 'abc'})
+        self.assertEqual(
+            [c.text for c in response.context['comments']],
+            self.texts[:PAGE])
@@ -0,0 +1,84 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import follow_graph
+from posts.models import Follow, Post, Tag
+
+User = get_user_model()
+
+
+class FollowGraphTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.authors = [
+            User.objects.create_user(username=f'Author{i}') for i in range(10)
+        ]
+        for author in cls.authors[::2]:
+            Follow.objects.create(user=cls.reader, author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_bulk_membership_is_one_query_then_none(self):
+        """На кого из 10 авторов подписан пользователь — один запрос при
+        холодном кеше и ни одного при тёплом."""
+        author_ids = [author.pk for author in self.authors]
+        expected = {author.pk for author in self.authors[::2]}
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                follow_graph.followed_among(self.reader, author_ids),
+                expected)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                follow_graph.followed_among(self.reader, author_ids),
+                expected)
+            self.assertTrue(
+                follow_graph.follows(self.reader, self.authors[0].pk))
+            self.assertFalse(
+                follow_graph.follows(self.reader, self.authors[1].pk))
+        self.assertEqual(
+            follow_graph.followed_among(AnonymousUser(), author_ids), set())
+
+    def test_follow_and_unfollow_invalidate(self):
+        author = self.authors[1]
+        self.assertFalse(follow_graph.follows(self.reader, author.pk))
+        self.client.get(
+            reverse('posts:profile_follow', args=[author.username]))
+        self.assertTrue(follow_graph.follows(self.reader, author.pk))
+        self.client.get(
+            reverse('posts:profile_unfollow', args=[author.username]))
+        self.assertFalse(follow_graph.follows(self.reader, author.pk))
+
+    def test_repeated_follow_skips_insert(self):
+        """Повторная подписка не пытается вставить строку."""
+        author = self.authors[0]
+        follow_graph.followee_ids(self.reader.pk)
+        url = reverse('posts:profile_follow', args=[author.username])
+        with self.assertNumQueries(3):
+            # Сессия, пользователь и автор
+            self.client.get(url)
+        self.assertEqual(
+            Follow.objects.filter(user=self.reader, author=author).count(), 1)
+
+    def test_profile_reads_graph(self):
+        url = reverse('posts:profile', args=[self.authors[0].username])
+        self.assertTrue(self.client.get(url).context['following'])
+        url = reverse('posts:profile', args=[self.authors[1].username])
+        self.assertFalse(self.client.get(url).context['following'])
+
+    def test_tag_feed_marks_followed_authors(self):
+        """В ленте тега отмечены посты авторов из подписок; общие
+        карточки в кеше остаются без отметки."""
+        for author in self.authors[:2]:
+            Post.objects.create(author=author, text=f'#кофе от {author}')
+        url = reverse('posts:tag_posts', args=[Tag.objects.get().name])
+        response = self.client.get(url)
+        self.assertContains(response, 'Вы подписаны на автора', count=1)
+        self.assertNotContains(Client().get(url), 'Вы подписаны на автора')
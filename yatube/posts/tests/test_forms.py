@@ -1,3 +1,4 @@
+import hashlib
 import tempfile
 import shutil
 
@@ -13,7 +14,7 @@ User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
 class PostFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -65,10 +66,12 @@ class PostFormTests(TestCase):
         )
 
         self.assertEqual(Post.objects.count(), posts_count + 1)
+        # Картинка хранится под именем по хешу содержимого
+        digest = hashlib.sha256(self.small_gif).hexdigest()
         self.assertTrue(
             Post.objects.filter(
                 text='Тестовый текст',
-                image='posts/small.gif'
+                image=f'posts/{digest[:2]}/{digest}.gif'
             ).exists()
         )
 
@@ -0,0 +1,147 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+from posts.paginators import (ApproximateCountPaginator, CursorPage,
+                              CursorPaginator, estimate_count)
+
+User = get_user_model()
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.guest_client = Client()
+        cls.author = User.objects.create_user(username='Author')
+        # Создадим в БД 25 постов
+        for i in range(25):
+            Post.objects.create(author=cls.author, text=f'Пост {i}')
+        cls.post_list = Post.objects.order_by('-pub_date', '-id')
+
+    def test_cursor_walk_covers_feed(self):
+        """Проход по курсорам выдаёт всю ленту без повторов и пропусков."""
+        paginator = CursorPaginator(self.post_list, 10)
+        page = paginator.page()
+        seen = list(page)
+        while page.has_next():
+            page = paginator.page(after=page.next_token)
+            seen.extend(page)
+        self.assertEqual(seen, list(self.post_list))
+        self.assertEqual(len(page), 5)
+        self.assertTrue(page.has_previous())
+
+    def test_cursor_before_returns_previous_page(self):
+        """Токен `before` возвращает предыдущую страницу."""
+        paginator = CursorPaginator(self.post_list, 10)
+        first = paginator.page()
+        second = paginator.page(after=first.next_token)
+        back = paginator.page(before=second.previous_token)
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+        self.assertTrue(back.has_next())
+
+    def test_cursor_query_has_no_offset_and_count(self):
+        """Курсорная страница — один запрос без OFFSET и COUNT."""
+        paginator = CursorPaginator(self.post_list, 10)
+        token = paginator.page().next_token
+        with self.assertNumQueries(1) as context:
+            list(paginator.page(after=token))
+        sql = context.captured_queries[0]['sql'].upper()
+        self.assertNotIn('OFFSET', sql)
+        self.assertNotIn('COUNT(', sql)
+
+    def test_views_accept_cursor_tokens(self):
+        """Ленты принимают `?after=`, а битый токен даёт первую страницу."""
+        cache.clear()
+        response = self.guest_client.get(reverse('posts:index'))
+        token = CursorPaginator(self.post_list, 10).encode(
+            response.context['page_obj'][-1])
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': 'Author'}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url + f'?after={token}')
+                page_obj = response.context['page_obj']
+                self.assertIsInstance(page_obj, CursorPage)
+                self.assertEqual(list(page_obj), list(self.post_list[10:20]))
+                self.assertContains(response, '?before=')
+
+                response = self.guest_client.get(url + '?after=broken')
+                self.assertEqual(
+                    list(response.context['page_obj']),
+                    list(self.post_list[:10]),
+                )
+
+
+@override_settings(EXACT_COUNT_LIMIT=15)
+class ApproximateCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.guest_client = Client()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        for i in range(25):
+            Post.objects.create(author=cls.author, text=f'Пост {i}')
+        for i in range(5):
+            Post.objects.create(author=cls.reader, text=f'Заметка {i}')
+        cls.post_list = Post.objects.filter(
+            author=cls.author).order_by('-pub_date', '-id')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_small_list_is_counted_exactly(self):
+        """Ниже порога число записей точное."""
+        paginator = ApproximateCountPaginator(
+            Post.objects.filter(author=self.reader).order_by('-id'), 2)
+        self.assertEqual(paginator.count, 5)
+        self.assertFalse(paginator.approximate)
+
+    def test_large_list_count_is_cached(self):
+        """Выше порога полный COUNT(*) берётся из кеша."""
+        paginator = ApproximateCountPaginator(self.post_list, 10)
+        self.assertEqual(paginator.count, 25)
+        self.assertTrue(paginator.approximate)
+
+        Post.objects.create(author=self.author, text='Новый пост')
+        paginator = ApproximateCountPaginator(self.post_list, 10)
+        with self.assertNumQueries(1):
+            self.assertEqual(paginator.count, 25)
+
+    def test_unfiltered_list_uses_table_statistics(self):
+        """Для выборки без условий берётся оценка из статистики СУБД."""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.assertEqual(estimate_count(Post.objects.all()), 30)
+        self.assertIsNone(estimate_count(self.post_list))
+
+    def test_pages_past_estimate_are_served(self):
+        """Страницы за оценённой последней отдаются, пока есть записи."""
+        paginator = ApproximateCountPaginator(self.post_list, 10)
+        # Устаревшая оценка: записей на самом деле 25
+        paginator.count = 16
+        paginator._approximate = True
+        page = paginator.get_page(3)
+        self.assertEqual(list(page), list(self.post_list[20:]))
+        self.assertFalse(page.has_next())
+        self.assertTrue(paginator.get_page(2).has_next())
+        self.assertEqual(paginator.get_page(4).number, 1)
+
+    def test_feed_shows_many_pages(self):
+        """При приблизительном числе страниц нет ссылки на последнюю."""
+        response = self.guest_client.get(
+            reverse('posts:profile', kwargs={'username': 'Author'}))
+        self.assertTrue(response.context['page_obj'].paginator.approximate)
+        self.assertContains(response, 'много страниц')
+        self.assertNotContains(response, 'Последняя')
+
+        response = self.guest_client.get(
+            reverse('posts:profile', kwargs={'username': 'Reader'}))
+        self.assertNotContains(response, 'много страниц')
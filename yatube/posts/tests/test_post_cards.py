@@ -0,0 +1,76 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import TestCase
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class PostCardsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        for i in range(10):
+            Post.objects.create(author=cls.author, text=f'Пост {i}')
+
+    def setUp(self):
+        cache.clear()
+
+    def render(self):
+        template = Template(
+            '{% load post_cards %}{% post_cards posts as cards %}'
+            '{% for card in cards %}{{ card }}{% endfor %}'
+        )
+        posts = Post.objects.select_related('author', 'group')
+        return template.render(Context({'posts': posts}))
+
+    def test_warm_page_uses_one_cache_round_trip(self):
+        """Страница из 10 карточек при тёплом кеше — один get_many."""
+        self.render()
+        with mock.patch(
+            'posts.templatetags.post_cards.cache', wraps=cache
+        ) as cache_mock, mock.patch(
+            'posts.templatetags.post_cards.render_to_string'
+        ) as render_mock:
+            self.render()
+        self.assertEqual(cache_mock.get_many.call_count, 1)
+        self.assertFalse(cache_mock.set_many.called)
+        self.assertFalse(render_mock.called)
+
+    def test_card_is_rerendered_after_post_change(self):
+        """Изменение поста меняет ключ его карточки."""
+        post = Post.objects.first()
+        self.render()
+        Post.objects.filter(pk=post.pk).update(text='Без сигналов')
+        self.assertNotIn('Без сигналов', self.render())
+
+        post.text = 'Отредактированный пост'
+        post.save()
+        self.assertIn('Отредактированный пост', self.render())
+
+    def test_card_is_rerendered_after_author_or_group_change(self):
+        """Переименование автора или группы и удаление группы меняют
+        ключи карточек, хотя сами посты не сохраняются."""
+        group = Group.objects.create(title='Группа', slug='old-slug')
+        Post.objects.update(group=group)
+        self.assertIn('/group/old-slug/', self.render())
+
+        group.slug = 'new-slug'
+        group.save()
+        html = self.render()
+        self.assertIn('/group/new-slug/', html)
+        self.assertNotIn('/group/old-slug/', html)
+
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = 'Новое'
+        author.last_name = 'Имя'
+        author.save()
+        self.assertIn('Новое Имя', self.render())
+
+        group.delete()
+        self.assertNotIn('/group/', self.render())
@@ -0,0 +1,55 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from posts.tests.utils import QueryBudgetMixin
+
+User = get_user_model()
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='User')
+        cls.authorized_user = Client()
+        cls.authorized_user.force_login(cls.user)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        # У каждого поста свой автор, чтобы N+1 был заметен
+        for i in range(12):
+            author = User.objects.create_user(
+                username=f'Author{i}', first_name='Имя', last_name=str(i))
+            Follow.objects.create(user=cls.user, author=author)
+            cls.post = Post.objects.create(
+                author=author, text=f'Пост {i}', group=cls.group)
+            Comment.objects.create(
+                post=cls.post, author=author, text=f'Комментарий {i}')
+        for i in range(12):
+            commentator = User.objects.create_user(username=f'Reader{i}')
+            Comment.objects.create(
+                post=cls.post, author=commentator, text='Комментарий')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_fit_query_budget(self):
+        """Число запросов страниц не зависит от числа постов
+        и комментариев на них."""
+        budgets = {
+            reverse('posts:index'): 4,
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}): 5,
+            reverse('posts:profile', kwargs={'username': 'Author0'}): 6,
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}): 4,
+            reverse('posts:follow_index'): 5,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url):
+                response = self.assertQueryBudget(
+                    self.authorized_user, url, budget)
+                self.assertEqual(response.status_code, 200)
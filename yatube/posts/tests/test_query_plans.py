@@ -0,0 +1,97 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import timeline
+from posts.models import Comment, Follow, Group, Post
+from posts.paginators import CursorPaginator
+
+User = get_user_model()
+
+# «SCAN posts_post» без «USING ... INDEX» — полный проход по таблице
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?(?P<table>\w+)(?!.* USING )')
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='User')
+        cls.author = User.objects.create_user(username='Author')
+        cls.authorized_user = Client()
+        cls.authorized_user.force_login(cls.user)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for i in range(15):
+            cls.post = Post.objects.create(
+                author=cls.author, text=f'Пост {i}', group=cls.group)
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text='Комментарий')
+
+    def plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def full_scans(self, sql):
+        details = self.plan(sql)
+        return [
+            detail for detail in details
+            if FULL_SCAN.match(detail)
+            and FULL_SCAN.match(detail).group('table').startswith('posts_')
+        ]
+
+    def test_views_do_not_scan_posts_tables(self):
+        """Запросы лент, поста и подписки не делают полный проход
+        по таблицам приложения posts."""
+        cache.clear()
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'Author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:follow_index'),
+            reverse('posts:profile_follow', kwargs={'username': 'Author'}),
+        )
+        for url in urls:
+            with CaptureQueriesContext(connection) as context:
+                self.authorized_user.get(url)
+            for query in context.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT'):
+                    continue
+                with self.subTest(url=url, sql=sql):
+                    self.assertEqual(self.full_scans(sql), [])
+
+    def test_follow_feed_is_sorted_by_timeline_index(self):
+        """Лента подписок — и страницами, и по курсору — читается по
+        индексу ленты без сортировки во временном B-дереве."""
+        token = CursorPaginator(
+            timeline.entries(self.user), 10,
+            ordering=timeline.ORDERING).page().next_token
+        url = reverse('posts:follow_index')
+        for params in ({}, {'page': 2}, {'after': token}):
+            with CaptureQueriesContext(connection) as context:
+                response = self.authorized_user.get(url, params)
+            self.assertTrue(response.context['page_obj'])
+            feed_queries = [
+                query['sql'] for query in context.captured_queries
+                if 'posts_timelineentry' in query['sql']
+                and 'ORDER BY' in query['sql']
+            ]
+            self.assertTrue(feed_queries)
+            for sql in feed_queries:
+                with self.subTest(params=params, sql=sql):
+                    plan = self.plan(sql)
+                    self.assertFalse(
+                        [detail for detail in plan if 'TEMP B-TREE' in detail],
+                        plan)
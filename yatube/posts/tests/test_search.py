@@ -0,0 +1,115 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import search
+from posts.models import Post
+
+User = get_user_model()
+
+
+def found(query):
+    results = search.SearchResults(query)
+    return [post.text for post in results[:results.count()]]
+
+
+class SearchIndexTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.coffee = Post.objects.create(
+            author=cls.author, text='Утренний Кофе')
+        cls.tea = Post.objects.create(
+            author=cls.author, text='Вечерний чай')
+
+    def test_search_by_word_prefix_and_case(self):
+        """Поиск не зависит от регистра и ищет по началу слова."""
+        for query in ('кофе', 'КОФ', 'утренний кофе', 'утр коф'):
+            with self.subTest(query=query):
+                self.assertEqual(found(query), ['Утренний Кофе'])
+        self.assertEqual(found('кофе чай'), [])
+
+    def test_ranked_by_relevance(self):
+        """Пост, где слово встречается чаще, выше в выдаче."""
+        Post.objects.create(author=self.author, text='Чай, чай и чай')
+        self.assertEqual(found('чай'), ['Чай, чай и чай', 'Вечерний чай'])
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при изменении, удалении, bulk_create и
+        update()."""
+        self.tea.text = 'Вечерний какао'
+        self.tea.save()
+        self.assertEqual(found('чай'), [])
+        self.assertEqual(found('какао'), ['Вечерний какао'])
+        Post.objects.bulk_create([Post(author=self.author, text='Сок')])
+        Post.objects.filter(pk=self.coffee.pk).update(text='Морс')
+        self.assertEqual(found('сок'), ['Сок'])
+        self.assertEqual(found('морс'), ['Морс'])
+        self.assertEqual(found('кофе'), [])
+        self.tea.delete()
+        self.assertEqual(found('какао'), [])
+
+    def test_query_syntax_is_escaped(self):
+        """Операторы FTS5 в запросе ищутся как обычные слова."""
+        for query in ('"', 'OR', 'кофе NEAR(', '*', '   '):
+            with self.subTest(query=query):
+                self.assertEqual(found(query), [])
+
+    def test_restore_triggers(self):
+        """Потерянные триггеры восстанавливаются, индекс
+        перестраивается."""
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER posts_post_fts_insert')
+        Post.objects.create(author=self.author, text='Лимонад')
+        self.assertEqual(found('лимонад'), [])
+        self.assertTrue(search.restore_triggers())
+        self.assertFalse(search.restore_triggers())
+        self.assertEqual(found('лимонад'), ['Лимонад'])
+
+
+class SearchViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        Post.objects.bulk_create(
+            Post(author=cls.author, text=f'Пост про кофе {i}')
+            for i in range(15)
+        )
+        Post.objects.create(author=cls.author, text='Пост про чай')
+
+    def test_search_page(self):
+        """Страница поиска показывает найденные посты по 10 и сохраняет
+        запрос в ссылках пагинатора."""
+        response = Client().get(reverse('posts:post_search'), {'q': 'кофе'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.count, 15)
+        self.assertEqual(len(page_obj), 10)
+        self.assertContains(response, 'href="?q=%D0%BA%D0%BE%D1%84%D0%B5'
+                                      '&amp;page=2"')
+        response = Client().get(
+            reverse('posts:post_search'), {'q': 'кофе', 'page': 2})
+        self.assertEqual(len(response.context['page_obj']), 5)
+
+    def test_empty_query(self):
+        """Пустой запрос показывает только форму."""
+        response = Client().get(reverse('posts:post_search'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page_obj'].paginator.count, 0)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт по индексу FTS, а не LIKE."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin')
+        client = Client()
+        client.force_login(admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(
+                reverse('admin:posts_post_changelist'), {'q': 'чай'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertIn('MATCH', sql)
+        self.assertNotIn('LIKE', sql)
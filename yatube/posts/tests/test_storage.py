@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from posts import thumbnails
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_post(self, filename):
+        return Post.objects.create(
+            author=self.author,
+            text='Репост',
+            image=SimpleUploadedFile(filename, SMALL_GIF, 'image/gif'),
+        )
+
+    def test_identical_uploads_share_file_and_thumbnails(self):
+        """Одинаковые загрузки хранятся одним файлом с общими
+        миниатюрами."""
+        first = self.create_post('meme.gif')
+        second = self.create_post('meme-copy.GIF')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.startswith('posts/'))
+        directory = os.path.dirname(first.image.path)
+        self.assertEqual(os.listdir(directory),
+                         [os.path.basename(first.image.path)])
+
+        thumbnails.schedule(first)
+        self.assertIsNotNone(thumbnails.get_responsive(second.image))
+
+    def test_rewrite_command_renames_and_deduplicates(self):
+        """Команда переводит старые имена на хеши и удаляет дубликаты."""
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'posts'), exist_ok=True)
+        for name in ('old.gif', 'old_copy.gif'):
+            with open(os.path.join(TEMP_MEDIA_ROOT, 'posts', name),
+                      'wb') as file:
+                file.write(SMALL_GIF)
+        old = Post.objects.create(
+            author=self.author, text='Старый', image='posts/old.gif')
+        copy = Post.objects.create(
+            author=self.author, text='Копия', image='posts/old_copy.gif')
+        missing = Post.objects.create(
+            author=self.author, text='Без файла', image='posts/lost.gif')
+
+        out = StringIO()
+        call_command('rewrite_post_images', stdout=out)
+
+        old.refresh_from_db()
+        copy.refresh_from_db()
+        missing.refresh_from_db()
+        self.assertEqual(old.image.name, copy.image.name)
+        self.assertTrue(os.path.exists(old.image.path))
+        self.assertEqual(missing.image.name, 'posts/lost.gif')
+        for name in ('old.gif', 'old_copy.gif'):
+            self.assertFalse(os.path.exists(
+                os.path.join(TEMP_MEDIA_ROOT, 'posts', name)))
+        self.assertIn('нет файла 1', out.getvalue())
+
+        out = StringIO()
+        call_command('rewrite_post_images', stdout=out)
+        self.assertIn('Переименовано 0, дубликатов 0', out.getvalue())
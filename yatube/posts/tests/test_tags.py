@@ -0,0 +1,142 @@
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import tags
+from posts.models import Mention, Post, PostTag, Tag
+
+User = get_user_model()
+
+
+def tagged(name):
+    return set(PostTag.objects.filter(
+        tag__name=name).values_list('post__text', flat=True))
+
+
+class ExtractionTests(TestCase):
+    def test_tag_names(self):
+        """Теги — слова после «#» в нижнем регистре, без повторов."""
+        text = 'Утро #Кофе и #кофе, #чай_2! a#b #'
+        self.assertEqual(tags.tag_names(text), ['кофе', 'чай_2'])
+
+    def test_mentioned_usernames(self):
+        """Упоминания — имена после «@»; почта и точка в конце
+        предложения упоминаниями не считаются."""
+        text = 'Привет, @anna и @ivan.petrov. Пиши на mail@example.com'
+        self.assertEqual(
+            tags.mentioned_usernames(text), ['anna', 'ivan.petrov'])
+
+    def test_linkify(self):
+        """Теги и упоминания становятся ссылками, остальной текст
+        экранируется."""
+        html = tags.linkify('<b>#Кофе</b> от @anna & co')
+        self.assertEqual(
+            html,
+            '&lt;b&gt;<a href="{}">#Кофе</a>&lt;/b&gt; от '
+            '<a href="{}">@anna</a> &amp; co'.format(
+                reverse('posts:tag_posts', args=['кофе']),
+                reverse('posts:profile', args=['anna'])),
+        )
+
+
+class TagIndexTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.anna = User.objects.create_user(username='anna')
+
+    def test_index_follows_post_changes(self):
+        """Теги и упоминания обновляются при создании, правке и удалении
+        поста; несуществующие пользователи не упоминаются."""
+        post = Post.objects.create(
+            author=self.author, text='#кофе для @anna и @nobody')
+        self.assertEqual(tagged('кофе'), {post.text})
+        self.assertEqual(
+            list(Mention.objects.values_list('user', 'pub_date')),
+            [(self.anna.pk, post.pub_date)])
+        post.text = '#чай'
+        post.save()
+        self.assertEqual(tagged('кофе'), set())
+        self.assertEqual(tagged('чай'), {'#чай'})
+        self.assertFalse(Mention.objects.exists())
+        post.delete()
+        self.assertFalse(PostTag.objects.exists())
+
+    def test_save_without_text_change_skips_index(self):
+        """Сохранение без правки текста не трогает теги."""
+        post = Post.objects.create(author=self.author, text='#кофе')
+        with self.assertNumQueries(2):
+            # Только чтение старой версии и UPDATE
+            post.save()
+
+    def test_backfill_command(self):
+        """Команда заполняет теги постов, созданных в обход сигналов, и
+        ничего не дублирует при повторном запуске."""
+        Post.objects.bulk_create([
+            Post(author=self.author, text=f'#пост{i % 3} для @anna')
+            for i in range(7)
+        ])
+        for _ in range(2):
+            call_command('backfill_tags', batch_size=3, stdout=open(
+                '/dev/null', 'w'))
+            self.assertEqual(Tag.objects.count(), 3)
+            self.assertEqual(PostTag.objects.count(), 7)
+            self.assertEqual(Mention.objects.filter(
+                user=self.anna).count(), 7)
+
+
+class TagFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.anna = User.objects.create_user(username='anna')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'Пост {i} #Кофе @anna')
+            for i in range(13)
+        ]
+        Post.objects.create(author=cls.author, text='Пост без тегов')
+
+    def feed(self, url):
+        """Тексты постов ленты по всем страницам курсора."""
+        texts = []
+        params = {}
+        while params is not None:
+            response = Client().get(url, params)
+            self.assertEqual(response.status_code, 200)
+            page = response.context['page_obj']
+            texts.extend(post.text for post in page)
+            params = ({'after': page.next_token} if page.has_next()
+                      else None)
+        return texts
+
+    def test_tag_feed(self):
+        """Лента тега — посты с тегом от новых к старым, по курсору."""
+        url = reverse('posts:tag_posts', args=['КОФЕ'])
+        self.assertEqual(
+            self.feed(url), [post.text for post in self.posts[::-1]])
+        response = Client().get(url)
+        self.assertContains(
+            response, reverse('posts:tag_posts', args=['кофе']))
+
+    def test_mentions_feed(self):
+        """Лента упоминаний — посты, где упомянут пользователь."""
+        self.assertEqual(
+            self.feed(reverse('posts:mentions', args=['anna'])),
+            [post.text for post in self.posts[::-1]])
+        self.assertEqual(
+            self.feed(reverse('posts:mentions', args=['Author'])), [])
+
+    def test_unknown_tag(self):
+        response = Client().get(reverse('posts:tag_posts', args=['нет']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_feed_queries(self):
+        """Страница ленты тега — запрос тега и один запрос постов с
+        авторами и группами."""
+        Client().get(reverse('posts:tag_posts', args=['кофе']))
+        with self.assertNumQueries(2):
+            Client().get(reverse('posts:tag_posts', args=['кофе']))
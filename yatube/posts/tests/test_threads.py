@@ -0,0 +1,140 @@
+import importlib
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import threads
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class ThreadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.other_post = Post.objects.create(author=cls.author, text='Другой')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def comment(self, text, parent=None):
+        return Comment.objects.create(
+            post=self.post, author=self.author, text=text,
+            parent=threads.reply_parent(parent))
+
+    def reply(self, text, parent=None, post=None):
+        """Отправляет комментарий через add_comment."""
+        data = {'text': text}
+        if parent is not None:
+            data['parent'] = parent.pk
+        self.client.post(
+            reverse('posts:add_comment', args=[(post or self.post).pk]),
+            data)
+        return Comment.objects.get(text=text)
+
+    def texts(self, comments):
+        return [comment.text for comment in comments]
+
+    def test_replies_follow_their_parent(self):
+        """Комментарии идут в порядке веток: ответы сразу за тем, на
+        что отвечают, соседние — по времени."""
+        first = self.reply('1')
+        second = self.reply('2')
+        answer = self.reply('1.1', first)
+        self.reply('1.1.1', answer)
+        self.reply('1.2', first)
+        self.reply('2.1', second)
+        ordered = Comment.objects.filter(post=self.post).order_by('path')
+        self.assertEqual(
+            self.texts(ordered), ['1', '1.1', '1.1.1', '1.2', '2', '2.1'])
+        self.assertEqual(answer.parent, first)
+        self.assertEqual(answer.depth, 1)
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        self.assertEqual(
+            self.texts(response.context['comments']),
+            ['1', '1.1', '1.1.1', '1.2', '2', '2.1'])
+
+    def test_subtree_is_one_range_query(self):
+        """Ветка и ветка с ограничением глубины — один запрос, без
+        соседних веток (в том числе с похожими id)."""
+        roots = [self.comment(f'корень {i}') for i in range(11)]
+        first = self.comment('1.1', roots[1])
+        self.comment('1.1.1', first)
+        self.comment('10.1', roots[10])
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                self.texts(threads.subtree(roots[1])),
+                ['корень 1', '1.1', '1.1.1'])
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                self.texts(threads.subtree(roots[1], max_depth=1)),
+                ['корень 1', '1.1'])
+
+    def test_deep_nesting(self):
+        """Длинная цепочка ответов читается одним запросом; глубже
+        MAX_DEPTH ответы прикрепляются к родителю."""
+        chain = [self.comment('0')]
+        for i in range(1, threads.MAX_DEPTH + 20):
+            chain.append(self.comment(str(i), chain[-1]))
+        deepest = max(comment.depth for comment in chain)
+        self.assertEqual(deepest, threads.MAX_DEPTH)
+        for comment in chain:
+            comment.refresh_from_db()
+            self.assertLessEqual(len(comment.path), 1000)
+        with self.assertNumQueries(1):
+            subtree = list(threads.subtree(chain[0]))
+        self.assertEqual(len(subtree), len(chain))
+        self.assertEqual(
+            [comment.depth for comment in subtree[:threads.MAX_DEPTH + 1]],
+            list(range(threads.MAX_DEPTH + 1)))
+        middle = chain[50]
+        self.assertEqual(
+            self.texts(threads.subtree(middle, max_depth=2)),
+            ['50', '51', '52'])
+
+    def test_thread_page(self):
+        """?thread= показывает одну ветку, ?depth= ограничивает её
+        глубину; ссылки на следующие порции их сохраняют."""
+        first = self.reply('1')
+        self.reply('2')
+        answer = self.reply('1.1', first)
+        self.reply('1.1.1', answer)
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        response = self.client.get(url, {'thread': first.pk})
+        self.assertEqual(
+            self.texts(response.context['comments']), ['1', '1.1', '1.1.1'])
+        self.assertContains(response, 'Все комментарии')
+        response = self.client.get(url, {'thread': first.pk, 'depth': 1})
+        self.assertEqual(
+            self.texts(response.context['comments']), ['1', '1.1'])
+        self.assertEqual(
+            response.context['comments_query'],
+            f'thread={first.pk}&depth=1&')
+
+    def test_parent_from_other_post_is_ignored(self):
+        """Ответ на комментарий другого поста становится обычным
+        комментарием."""
+        foreign = self.reply('чужой', post=self.other_post)
+        comment = self.reply('ответ', foreign)
+        self.assertIsNone(comment.parent)
+        self.assertEqual(comment.depth, 0)
+
+    def test_migration_fills_paths(self):
+        """Миграция делает существующие комментарии корнями веток."""
+        comments = [self.comment(str(i)) for i in range(3)]
+        Comment.objects.update(path='')
+        migration = importlib.import_module(
+            'posts.migrations.0015_comment_threads')
+        migration.fill_paths(apps, None)
+        for comment in comments:
+            comment.refresh_from_db()
+            self.assertEqual(comment.path, threads.segment(comment.pk))
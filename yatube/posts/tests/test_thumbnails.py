@@ -0,0 +1,298 @@
+import os
+import shutil
+import tempfile
+import threading
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from posts import caching, thumbnails
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=2)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.guest_client = Client()
+        cls.author = User.objects.create_user(username='Author')
+        cls.authorized_author = Client()
+        cls.authorized_author.force_login(cls.author)
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_placeholder_until_thumbnail_is_ready(self):
+        """Пока миниатюры нет, страница показывает заглушку и не ждёт
+        генерации; готовая миниатюра появляется без ручного сброса кеша."""
+        with mock.patch('posts.thumbnails.schedule') as schedule:
+            response = self.guest_client.get(reverse('posts:index'))
+        schedule.assert_called_once_with(self.post)
+        self.assertContains(response, 'Изображение обрабатывается')
+        self.assertNotContains(response, '<img class="card-img')
+
+        with override_settings(THUMBNAIL_WORKERS=0):
+            thumbnails.schedule(self.post)
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, '<img class="card-img')
+        self.assertNotContains(response, 'Изображение обрабатывается')
+
+    def test_duplicate_requests_are_coalesced(self):
+        """Повторные запросы картинки в работе склеиваются в одну задачу."""
+        release = threading.Event()
+        with mock.patch(
+            'posts.thumbnails.generate',
+            side_effect=lambda *args: release.wait(5),
+        ) as generate:
+            first = thumbnails.schedule(self.post)
+            second = thumbnails.schedule(self.post)
+            release.set()
+            first.result(5)
+        self.assertIs(first, second)
+        generate.assert_called_once()
+        self.assertNotIn(self.post.image.name, thumbnails._pending)
+
+    def test_upload_schedules_generation(self):
+        """Создание и правка поста с картинкой ставят генерацию в очередь
+        после коммита."""
+        with mock.patch(
+            'posts.views.transaction.on_commit',
+            side_effect=lambda callback: callback(),
+        ), mock.patch('posts.thumbnails.schedule') as schedule:
+            self.authorized_author.post(reverse('posts:post_create'), {
+                'text': 'Новый пост',
+                'image': SimpleUploadedFile(
+                    'new.gif', SMALL_GIF, 'image/gif'),
+            })
+            self.authorized_author.post(
+                reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+                {'text': 'Без новой картинки'},
+            )
+        new_post = Post.objects.get(text='Новый пост')
+        schedule.assert_called_once_with(new_post)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ResponsiveImageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.guest_client = Client()
+        cls.author = User.objects.create_user(username='Author')
+        photo = Image.new('RGB', (2000, 1500), (200, 100, 50))
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        buffer = BytesIO()
+        photo.save(buffer, 'JPEG', quality=95, exif=exif.tobytes())
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Пост с фотографией',
+            image=SimpleUploadedFile(
+                'photo.jpg', buffer.getvalue(), 'image/jpeg'),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        thumbnails.schedule(self.post)
+
+    def test_variants_are_progressive_without_exif(self):
+        """Все ширины созданы, JPEG прогрессивный и без EXIF."""
+        for width in thumbnails.CARD_WIDTHS:
+            for format_ in thumbnails.FORMATS:
+                name = thumbnails.card_variant(width, format_)
+                with self.subTest(variant=name):
+                    thumbnail = thumbnails.get(self.post.image, name)
+                    self.assertIsNotNone(thumbnail)
+                    with Image.open(thumbnail.storage.open(
+                            thumbnail.name)) as image:
+                        self.assertEqual(image.format, format_)
+                        self.assertEqual(image.width, width)
+                        self.assertNotIn('exif', image.info)
+                        if format_ == 'JPEG':
+                            self.assertTrue(image.info.get('progressive'))
+
+    def test_card_has_srcset(self):
+        """Карточка поста перечисляет ширины в srcset."""
+        response = self.guest_client.get(reverse('posts:index'))
+        for width in thumbnails.CARD_WIDTHS:
+            self.assertContains(response, f' {width}w')
+        self.assertContains(response, 'type="image/jpeg"')
+
+    def test_stats_report_saved_bytes(self):
+        """Статистика показывает экономию по каждому варианту."""
+        out = StringIO()
+        call_command('thumbnail_stats', stdout=out)
+        for name in thumbnails.VARIANTS:
+            self.assertIn(f'{name}: миниатюр 1', out.getvalue())
+        self.assertIn('сэкономлено', out.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailPrefetchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.guest_client = Client()
+        cls.author = User.objects.create_user(username='Author')
+        for i in range(10):
+            post = Post.objects.create(
+                author=cls.author,
+                text=f'Пост {i}',
+                image=SimpleUploadedFile(
+                    f'small{i}.gif', SMALL_GIF, 'image/gif'),
+            )
+            thumbnails.schedule(post)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_feeds_read_thumbnails_in_one_batch(self):
+        """Миниатюры страницы читаются из хранилища одним запросом."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': 'Author'}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                # Холодный кеш: хранилище ключей sorl читается из БД
+                cache.clear()
+                with CaptureQueriesContext(connection) as context:
+                    response = self.guest_client.get(url)
+                kvstore_queries = [
+                    query for query in context.captured_queries
+                    if 'thumbnail_kvstore' in query['sql']
+                ]
+                self.assertEqual(len(kvstore_queries), 1)
+                self.assertContains(
+                    response, '<img class="card-img', count=10)
+
+    def test_warm_cards_skip_thumbnail_lookup(self):
+        """Карточки из кеша фрагментов не читают миниатюры вовсе."""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        # Сбрасываем только кеш страниц: карточки остаются в кеше
+        caching.invalidate(caching.index_scope())
+        with mock.patch.object(
+            thumbnails.Backend, 'lookup_many'
+        ) as lookup_many:
+            self.guest_client.get(url)
+        self.assertFalse(lookup_many.called)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class RegenerateThumbnailsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.posts = []
+        for i in range(5):
+            # Разные картинки: одинаковые хранились бы одним файлом
+            buffer = BytesIO()
+            Image.new('RGB', (40, 30), (i * 40, 0, 0)).save(buffer, 'PNG')
+            cls.posts.append(Post.objects.create(
+                author=cls.author,
+                text=f'Пост {i}',
+                image=SimpleUploadedFile(
+                    f'image{i}.png', buffer.getvalue(), 'image/png'),
+            ))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.state_file = os.path.join(TEMP_MEDIA_ROOT, 'state.json')
+
+    def regenerate(self, *args):
+        out = StringIO()
+        call_command(
+            'regenerate_thumbnails', '--workers=0', '--chunk-size=2',
+            f'--state-file={self.state_file}', *args, stdout=out)
+        return out.getvalue()
+
+    def test_all_variants_are_generated(self):
+        """Команда создаёт все варианты и печатает скорость."""
+        output = self.regenerate()
+        for post in self.posts:
+            self.assertIsNotNone(thumbnails.get_responsive(post.image))
+        self.assertIn('в секунду', output)
+        self.assertIn('ошибок 0', output)
+        self.assertFalse(os.path.exists(self.state_file))
+
+    def test_interrupted_run_resumes(self):
+        """Прерванный запуск продолжается с последней целой пачки."""
+        calls = []
+
+        def interrupt(name, force):
+            calls.append(name)
+            if len(calls) == 3:
+                raise KeyboardInterrupt
+
+        with mock.patch('posts.thumbnails.regenerate', interrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                self.regenerate()
+        self.assertTrue(os.path.exists(self.state_file))
+
+        with mock.patch('posts.thumbnails.regenerate') as regenerate:
+            output = self.regenerate()
+        resumed = {call.args[0] for call in regenerate.call_args_list}
+        self.assertEqual(
+            resumed, {post.image.name for post in self.posts[2:]})
+        self.assertIn(f'Продолжаем после поста {self.posts[1].pk}', output)
+
+    def test_failures_are_reported(self):
+        """Ошибки отдельных картинок не останавливают обработку."""
+        broken = self.posts[0].image.name
+
+        def regenerate(name, force):
+            if name == broken:
+                raise OSError('битый файл')
+
+        with mock.patch('posts.thumbnails.regenerate', regenerate):
+            output = self.regenerate()
+        self.assertIn('ошибок 1', output)
+        self.assertIn(f'{broken}: OSError', output)
@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import timeline
+from posts.models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='User')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Author')
+        cls.authorized_user = Client()
+        cls.authorized_user.force_login(cls.user)
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает в материализованные ленты подписчиков."""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user, post=post).exists()
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists()
+        )
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка добавляет в ленту старые посты, отписка — убирает."""
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(3)
+        ]
+        self.authorized_user.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'Author'}))
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(user=self.user)
+                .values_list('post', flat=True)),
+            {post.pk for post in posts},
+        )
+        self.authorized_user.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': 'Author'}))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.user).exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_heavy_author_is_merged_at_read_time(self):
+        """Посты автора с большим числом подписчиков не раскладываются,
+        но всё равно попадают в ленту подписок."""
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        self.assertEqual(timeline.heavy_followees(self.user), [self.author.pk])
+        response = self.authorized_user.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_author_back_under_limit_is_fanned_out(self):
+        """Когда подписчиков снова не больше лимита, посты, написанные
+        без раскладки, появляются в лентах оставшихся подписчиков."""
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        Follow.objects.filter(user=self.reader).delete()
+
+        self.assertEqual(timeline.heavy_followees(self.user), [])
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user', 'post')),
+            [(self.user.pk, post.pk)],
+        )
+        response = self.authorized_user.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
@@ -0,0 +1,163 @@
+import io
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import warnings
+import zlib
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import (
+    SimpleUploadedFile, TemporaryUploadedFile)
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import views
+from posts.forms import PostForm
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+# Проверка формы с картинкой из stdin в отдельном процессе; печатает,
+# на сколько байт за неё вырос пик памяти процесса (ru_maxrss в Linux —
+# в килобайтах, в macOS — в байтах)
+MEASURE_SCRIPT = """
+import resource, sys
+import django
+django.setup()
+from django.core.files.uploadedfile import SimpleUploadedFile
+from posts.forms import PostForm
+content = sys.stdin.buffer.read()
+unit = 1 if sys.platform == 'darwin' else 1024
+started = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+form = PostForm({'text': 'Текст'}, {
+    'image': SimpleUploadedFile('image.png', content, 'image/png')})
+assert not form.is_valid()
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print((peak - started) * unit)
+"""
+
+
+def png_chunk(kind, data):
+    return (struct.pack('>I', len(data)) + kind + data
+            + struct.pack('>I', zlib.crc32(kind + data)))
+
+
+def blank_png(width, height):
+    """Чёрно-белый PNG из нулей: на диске — килобайты, а при
+    декодировании Pillow отводит байт на пиксель."""
+    header = struct.pack('>IIBBBBB', width, height, 1, 0, 0, 0, 0)
+    compressor = zlib.compressobj(9)
+    row = bytes(1 + (width + 7) // 8)
+    data = b''.join(compressor.compress(row) for _ in range(height))
+    data += compressor.flush()
+    return (b'\x89PNG\r\n\x1a\n' + png_chunk(b'IHDR', header)
+            + png_chunk(b'IDAT', data) + png_chunk(b'IEND', b''))
+
+
+def noise_png(width, height):
+    """Несжимаемый PNG заданного размера."""
+    image = Image.frombytes('RGB', (width, height),
+                            os.urandom(width * height * 3))
+    path = os.path.join(TEMP_MEDIA_ROOT, f'noise-{width}x{height}.png')
+    image.save(path)
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def validation_rss_growth(content):
+    """Рост пиковой памяти на проверку картинки формой.
+
+    ru_maxrss — максимум за всю жизнь процесса, и в процессе тестов его
+    уже подняли другие тесты, поэтому проверка идёт в свежем процессе.
+    """
+    result = subprocess.run(
+        [sys.executable, '-c', MEASURE_SCRIPT],
+        input=content, stdout=subprocess.PIPE, check=True,
+        cwd=settings.BASE_DIR,
+        env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'yatube.settings'},
+    )
+    return int(result.stdout)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ImageUploadTests(TestCase):
+    # Пиковая память свежего процесса не должна расти на проверку больше,
+    # чем на эту величину: декодирование картинки чуть больше лимита уже
+    # заняло бы около 40 МБ (байт на пиксель)
+    MAX_RSS_GROWTH = 16 * 1024 * 1024
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def upload(self, content, name='image.png'):
+        return self.client.post(reverse('posts:post_create'), {
+            'text': 'Текст',
+            'image': SimpleUploadedFile(name, content, 'image/png'),
+        })
+
+    def assert_rejected(self, content):
+        response = self.upload(content)
+        self.assertFalse(Post.objects.exists())
+        self.assertTrue(response.context['form'].errors['image'])
+        self.assertLess(validation_rss_growth(content), self.MAX_RSS_GROWTH)
+
+    def test_decompression_bomb_rejected_from_header(self):
+        """Картинка в 400 мегапикселей отклоняется, не будучи
+        декодированной."""
+        self.assert_rejected(blank_png(20000, 20000))
+
+    def test_image_over_pixel_limit_rejected(self):
+        """Картинка чуть больше POST_IMAGE_MAX_PIXELS тоже отклоняется."""
+        side = int(settings.POST_IMAGE_MAX_PIXELS ** 0.5) + 100
+        self.assert_rejected(blank_png(side, side))
+
+    def test_pillow_limits_are_not_changed(self):
+        """Лимит формы не меняет глобальные настройки Pillow: большие уже
+        сохранённые картинки (миниатюры, команды) открываются как раньше."""
+        side = int(settings.POST_IMAGE_MAX_PIXELS ** 0.5) + 100
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            image = Image.open(io.BytesIO(blank_png(side, side)))
+        self.assertEqual(image.size, (side, side))
+
+    def test_image_within_limits_accepted(self):
+        """Картинка в пределах лимитов сохраняется."""
+        self.upload(blank_png(1000, 500))
+        self.assertTrue(Post.objects.exclude(image='').exists())
+
+    @override_settings(POST_IMAGE_MAX_BYTES=1024)
+    def test_file_over_byte_limit_rejected(self):
+        """Файл больше POST_IMAGE_MAX_BYTES отклоняется."""
+        response = self.upload(noise_png(64, 64))
+        self.assertFalse(Post.objects.exists())
+        self.assertIn('Размер файла не должен превышать 1,0\xa0КБ.',
+                      response.context['form'].errors['image'])
+
+    def test_large_upload_streamed_to_temporary_file(self):
+        """Загрузка больше FILE_UPLOAD_MAX_MEMORY_SIZE приходит в форму
+        временным файлом на диске."""
+        content = noise_png(400, 400)
+        self.assertGreater(len(content), settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        with mock.patch.object(views, 'PostForm', wraps=PostForm) as form:
+            self.upload(content)
+        image = form.call_args[1]['files']['image']
+        self.assertIsInstance(image, TemporaryUploadedFile)
+        self.assertTrue(Post.objects.exclude(image='').exists())
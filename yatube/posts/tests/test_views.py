@@ -16,7 +16,7 @@ User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
 class PostViewsTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -240,31 +240,113 @@ class PostViewsTests(TestCase):
         )
 
     def test_cache_index(self):
-        """Для главной страницы (index) применяется хранение кеша."""
+        """Для главной страницы (index) применяется хранение кеша,
+        а новый пост сбрасывает его."""
 
+        cache.clear()
         response = self.authorized_author.get(reverse('posts:index'))
         posts = response.content
 
-        Post.objects.create(
-            text='test_new_post',
-            author=self.author,
-        )
+        # Изменение в обход сигналов не видно: страница берётся из кеша
+        Post.objects.filter(pk=self.post.pk).update(text='changed_post')
 
         response_old = self.authorized_author.get(reverse('posts:index'))
         old_posts = response_old.content
 
         self.assertEqual(old_posts, posts)
 
-        cache.clear()
+        Post.objects.create(
+            text='test_new_post',
+            author=self.author,
+        )
         response_new = self.authorized_author.get(reverse('posts:index'))
         new_posts = response_new.content
 
         self.assertNotEqual(old_posts, new_posts)
+        self.assertContains(response_new, 'test_new_post')
+
+    def test_cache_post_detail_invalidated_by_comment(self):
+        """Новый комментарий сбрасывает кеш страницы поста."""
+
+        cache.clear()
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.authorized_user.get(url)
+
+        Comment.objects.create(
+            post=self.post,
+            author=self.user,
+            text='Свежий комментарий',
+        )
+
+        response = self.authorized_user.get(url)
+        self.assertContains(response, 'Свежий комментарий')
+
+    def test_cache_feeds_invalidated_by_comment(self):
+        """Новый и удалённый комментарий обновляют число комментариев
+        в карточке поста на главной, в группе и в профиле."""
+
+        cache.clear()
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test-slug-2'}),
+            reverse('posts:profile', kwargs={'username': 'Author'}),
+        )
+        for url in urls:
+            self.assertNotContains(
+                self.authorized_user.get(url), 'Комментариев: 1')
+
+        comment = Comment.objects.create(
+            post=self.post,
+            author=self.user,
+            text='Свежий комментарий',
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.authorized_user.get(url), 'Комментариев: 1')
+
+        comment.delete()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertNotContains(
+                    self.authorized_user.get(url), 'Комментариев: 1')
+
+    def test_cache_feeds_invalidated_by_author_and_group_change(self):
+        """Переименование группы и автора и удаление группы видны в
+        закешированных лентах."""
+
+        cache.clear()
+        # Копии, чтобы не менять объекты класса для других тестов
+        group = Group.objects.get(pk=self.group_2.pk)
+        author = User.objects.get(pk=self.author.pk)
+        index = reverse('posts:index')
+        profile = reverse('posts:profile', kwargs={'username': 'Author'})
+        for url in (index, profile):
+            self.assertContains(self.authorized_user.get(url), 'test-slug-2')
+
+        group.slug = 'renamed-slug'
+        group.save()
+        for url in (index, profile):
+            with self.subTest(url=url):
+                response = self.authorized_user.get(url)
+                self.assertContains(response, 'renamed-slug')
+                self.assertNotContains(response, 'test-slug-2')
+
+        author.first_name = 'Переименованный'
+        author.save()
+        for url in (index, profile):
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.authorized_user.get(url), 'Переименованный')
+
+        group.delete()
+        self.assertNotContains(self.authorized_user.get(profile), '/group/')
 
     def test_add_or_remove_follow(self):
         """Авторизованный пользователь может подписываться на
         других пользователей и удалять их из подписок."""
 
+        cache.clear()
         # Follow
         self.authorized_user.get(reverse(
             'posts:profile_follow',
@@ -0,0 +1,19 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """Проверка «бюджета» SQL-запросов для страниц в тестах TestCase."""
+
+    def assertQueryBudget(self, client, url, budget):
+        """Страница `url` укладывается не более чем в `budget` запросов."""
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        queries = '\n'.join(
+            query['sql'] for query in context.captured_queries)
+        self.assertLessEqual(
+            len(context), budget,
+            f'Страница {url} выполнила {len(context)} запросов '
+            f'при бюджете {budget}:\n{queries}'
+        )
+        return response
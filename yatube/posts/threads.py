@@ -0,0 +1,56 @@
+"""Ветки ответов на комментарии (materialized path).
+
+У каждого комментария есть путь — id всех его предков от корня ветки и
+его собственный, каждый дополнен нулями до SEGMENT знаков. Сортировка
+по пути даёт обход веток в глубину: ответы идут сразу за комментарием,
+на который отвечают, а соседние — по порядку создания. Поддерево — это
+диапазон путей [путь, путь + «:»), потому что «:» в ASCII идёт сразу
+после цифр: вся ветка читается одним диапазоном по индексу
+(post, path), а ограничение глубины проверяется на тех же строках.
+
+Путь содержит id самого комментария, поэтому записывается вторым
+запросом сразу после вставки.
+"""
+from .models import Comment
+
+SEGMENT = 10
+MAX_DEPTH = Comment._meta.get_field('path').max_length // SEGMENT - 1
+# Символ сразу после цифр: верхняя граница путей поддерева
+PATH_END = ':'
+
+
+def segment(pk):
+    return str(pk).zfill(SEGMENT)
+
+
+def reply_parent(parent):
+    """Комментарий, к которому на деле прикрепить ответ на `parent`.
+
+    Ответ на комментарий самой большой глубины становится ответом на
+    его родителя: глубже ветка не растёт.
+    """
+    if parent is not None and parent.depth >= MAX_DEPTH:
+        return parent.parent
+    return parent
+
+
+def assign_path(comment):
+    """Записывает путь и глубину только что созданного комментария."""
+    parent = comment.parent if comment.parent_id else None
+    comment.path = (parent.path if parent else '') + segment(comment.pk)
+    comment.depth = parent.depth + 1 if parent else 0
+    Comment.objects.filter(pk=comment.pk).update(
+        path=comment.path, depth=comment.depth)
+
+
+def subtree(comment, max_depth=None):
+    """Комментарий и ветка под ним одним диапазоном по индексу
+    (post, path); `max_depth` — сколько уровней ответов брать."""
+    queryset = Comment.objects.filter(
+        post_id=comment.post_id,
+        path__gte=comment.path,
+        path__lt=comment.path + PATH_END,
+    )
+    if max_depth is not None:
+        queryset = queryset.filter(depth__lte=comment.depth + max_depth)
+    return queryset.order_by('path')
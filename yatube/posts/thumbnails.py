@@ -0,0 +1,316 @@
+"""Фоновая генерация миниатюр картинок постов.
+
+Шаблоны не вызывают Pillow: они берут только готовые миниатюры из
+хранилища ключей sorl-thumbnail, а если миниатюры ещё нет, ставят её
+генерацию в очередь и показывают заглушку. Генерацию выполняет пул
+потоков; повторные запросы одной картинки, пока она в работе,
+склеиваются в одну задачу внутри процесса и через блокировку в кеше —
+между процессами.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.utils.functional import cached_property
+from PIL import features
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as CachedDBStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import caching
+from .models import Post
+from .signals import post_cache_scopes
+
+logger = logging.getLogger(__name__)
+
+# Карточка поста: кадрирование 960x339 в нескольких ширинах для srcset.
+# Ширину 960 шаблоны показывали и раньше, шире картинки не растягиваем.
+CARD_SIZE = (960, 339)
+CARD_WIDTHS = (480, 720, 960)
+# Качество по форматам; WebP — только если Pillow собран с libwebp
+QUALITY = {'WEBP': 75, 'JPEG': 80}
+FORMATS = ('WEBP', 'JPEG') if features.check('webp') else ('JPEG',)
+MIME_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}
+
+
+def card_variant(width, format_):
+    return f'card-{width}-{format_.lower()}'
+
+
+# Варианты миниатюр: имя → (геометрия sorl, опции). sorl пишет
+# миниатюры без EXIF (поворот из EXIF применяется до сохранения),
+# JPEG — прогрессивный.
+VARIANTS = {
+    card_variant(width, format_): (
+        f'{width}x{round(width * CARD_SIZE[1] / CARD_SIZE[0])}',
+        {
+            'crop': 'center',
+            'upscale': True,
+            'format': format_,
+            'quality': QUALITY[format_],
+            'progressive': format_ == 'JPEG',
+        },
+    )
+    for format_ in FORMATS
+    for width in CARD_WIDTHS
+}
+DEFAULT_VARIANT = card_variant(CARD_SIZE[0], 'JPEG')
+LOCK_KEY = 'posts:thumbnail-lock:{}'
+LOCK_TIMEOUT = 60 * 5
+
+_executor = None
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+class Backend(ThumbnailBackend):
+    def _thumbnail_file(self, source, geometry_string, options):
+        """Имя и опции миниатюры — так же, как в get_thumbnail."""
+        options = dict(options)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage), options
+
+    def thumbnail_key(self, file_, geometry_string, **options):
+        """Ключ миниатюры в хранилище ключей sorl."""
+        thumbnail, options = self._thumbnail_file(
+            ImageFile(file_), geometry_string, options)
+        return add_prefix(thumbnail.key)
+
+    def lookup(self, file_, geometry_string, **options):
+        """Готовая миниатюра или None; в отличие от get_thumbnail
+        ничего не генерирует."""
+        thumbnail, options = self._thumbnail_file(
+            ImageFile(file_), geometry_string, options)
+        return default.kvstore.get(thumbnail)
+
+    def lookup_many(self, keys):
+        """Миниатюры по ключам хранилища одним чтением из кеша и одним
+        запросом к БД для промахов — вместо запроса на каждую."""
+        kvstore = default.kvstore
+        if not isinstance(kvstore, CachedDBStore):
+            raw = {key: kvstore._get_raw(key) for key in keys}
+        else:
+            raw = kvstore.cache.get_many(keys)
+            missing = [key for key in keys if key not in raw]
+            if missing:
+                found = dict(KVStoreModel.objects.filter(
+                    key__in=missing).values_list('key', 'value'))
+                # Как sorl, запоминаем и отсутствие ключа
+                fetched = {key: found.get(key, EMPTY_VALUE)
+                           for key in missing}
+                kvstore.cache.set_many(
+                    fetched, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+                raw.update(fetched)
+        return {
+            key: deserialize_image_file(value)
+            for key, value in raw.items()
+            if value and value != EMPTY_VALUE
+        }
+
+    def create_variants(self, file_, variants, force=False):
+        """Создаёт недостающие миниатюры, декодируя исходник один раз.
+
+        С `force` пересоздаёт и готовые — под теми же именами.
+        """
+        source = ImageFile(file_)
+        missing = []
+        for geometry_string, options in variants:
+            thumbnail, options = self._thumbnail_file(
+                source, geometry_string, options)
+            if force:
+                thumbnail.delete()
+            elif default.kvstore.get(thumbnail) is not None:
+                continue
+            missing.append((geometry_string, options, thumbnail))
+        if not missing:
+            return
+        source_image = default.engine.get_image(source)
+        try:
+            image_info = default.engine.get_image_info(source_image)
+            source.set_size(default.engine.get_image_size(source_image))
+            default.kvstore.get_or_set(source)
+            for geometry_string, options, thumbnail in missing:
+                if not thumbnail.exists():
+                    options['image_info'] = image_info
+                    self._create_thumbnail(
+                        source_image, geometry_string, options, thumbnail)
+                default.kvstore.set(thumbnail, source)
+        finally:
+            default.engine.cleanup(source_image)
+
+
+backend = Backend()
+
+
+def get(image, variant=DEFAULT_VARIANT):
+    prefetched = getattr(image.instance, '_thumbnail_prefetch', None)
+    if prefetched is not None:
+        return prefetched.get(image, variant)
+    geometry, options = VARIANTS[variant]
+    return backend.lookup(image, geometry, **options)
+
+
+class PagePrefetch:
+    """Миниатюры всех картинок страницы, прочитанные одним пакетом.
+
+    Чтение откладывается до первого обращения: если все карточки
+    страницы нашлись в кеше фрагментов, хранилище не читается вовсе.
+    """
+
+    def __init__(self, images):
+        self.images = list(images)
+
+    @cached_property
+    def keys(self):
+        return {
+            (image.name, variant): backend.thumbnail_key(
+                image, geometry, **options)
+            for image in self.images
+            for variant, (geometry, options) in VARIANTS.items()
+        }
+
+    @cached_property
+    def thumbnails(self):
+        return backend.lookup_many(list(self.keys.values()))
+
+    def get(self, image, variant):
+        key = self.keys.get((image.name, variant))
+        if key is None:
+            geometry, options = VARIANTS[variant]
+            return backend.lookup(image, geometry, **options)
+        return self.thumbnails.get(key)
+
+
+def prefetch(posts):
+    """Готовит пакетное чтение миниатюр для постов страницы."""
+    posts = [post for post in posts if post.image]
+    if not posts:
+        return
+    batch = PagePrefetch(post.image for post in posts)
+    for post in posts:
+        post._thumbnail_prefetch = batch
+
+
+class ResponsiveImage:
+    """Готовые варианты картинки для <picture>: `sources` — форматы
+    с их srcset, `src` — запасной JPEG для старых браузеров."""
+
+    def __init__(self, variants):
+        self.src = variants[DEFAULT_VARIANT]
+        self.width, self.height = CARD_SIZE
+        self.sources = [
+            {
+                'type': MIME_TYPES[format_],
+                'srcset': ', '.join(
+                    f'{variants[card_variant(width, format_)].url} {width}w'
+                    for width in CARD_WIDTHS
+                ),
+            }
+            for format_ in FORMATS
+        ]
+
+
+def get_responsive(image):
+    """Все варианты карточки или None, если хоть одного ещё нет."""
+    variants = {name: get(image, name) for name in VARIANTS}
+    if None in variants.values():
+        return None
+    return ResponsiveImage(variants)
+
+
+def generate(image, scopes):
+    """Создаёт все варианты миниатюр картинки и сбрасывает кеш страниц,
+    на которых вместо неё была заглушка."""
+    lock = LOCK_KEY.format(image.name)
+    if not cache.add(lock, True, LOCK_TIMEOUT):
+        # Эту картинку уже обрабатывает другой процесс
+        return
+    try:
+        backend.create_variants(image, VARIANTS.values())
+    finally:
+        cache.delete(lock)
+    caching.invalidate(*scopes)
+
+
+def regenerate(name, force=False):
+    """Создаёт варианты миниатюр картинки поста по имени файла.
+
+    Принимает только строку, чтобы её можно было передать в пул
+    процессов.
+    """
+    storage = Post._meta.get_field('image').storage
+    backend.create_variants(
+        ImageFile(name, storage), VARIANTS.values(), force=force)
+
+
+def _run(image, scopes):
+    try:
+        generate(image, scopes)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры %s', image.name)
+
+
+def _run_in_worker(image, scopes):
+    try:
+        _run(image, scopes)
+    finally:
+        close_old_connections()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def schedule(post):
+    """Ставит в очередь генерацию миниатюр картинки поста.
+
+    Пока задача для картинки не завершилась, повторные вызовы
+    возвращают её же. При THUMBNAIL_WORKERS = 0 миниатюры создаются
+    сразу, в текущем потоке.
+    """
+    if not post.image:
+        return None
+    image = post.image
+    scopes = post_cache_scopes(post)
+    if not settings.THUMBNAIL_WORKERS:
+        _run(image, scopes)
+        # Пакет страницы прочитан до генерации и устарел
+        vars(post).pop('_thumbnail_prefetch', None)
+        return None
+    with _pending_lock:
+        future = _pending.get(image.name)
+        if future is not None:
+            return future
+        future = _get_executor().submit(_run_in_worker, image, scopes)
+        _pending[image.name] = future
+    future.add_done_callback(lambda done: _forget(image.name, done))
+    return future
+
+
+def _forget(name, future):
+    with _pending_lock:
+        if _pending.get(name) is future:
+            del _pending[name]
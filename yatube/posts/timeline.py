@@ -0,0 +1,114 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Новый пост автора сразу раскладывается в ленты его подписчиков, и
+страница `/follow/` читается одним диапазоном по индексу
+(user, pub_date). Посты авторов с огромным числом подписчиков не
+раскладываются, а подмешиваются к ленте при чтении.
+"""
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Follow, Post, TimelineEntry, UserStats
+
+BATCH_SIZE = 500
+# Порядок ленты, совпадающий с индексом timeline_user_pub_date_idx
+ORDERING = ('-pub_date', '-post_id')
+
+
+def fanout_limit():
+    return settings.TIMELINE_FANOUT_LIMIT
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_heavy(post.author_id):
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post.pk,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for user_id in follower_ids.iterator()
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту нового подписчика уже опубликованные посты."""
+    if is_heavy(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id).values_list('pk', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for post_id, pub_date in posts.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def catch_up(author_id):
+    """Раскладывает посты автора, число подписчиков которого опустилось
+    до лимита: пока их было больше, посты не раскладывались, а теперь
+    перестанут подмешиваться при чтении."""
+    if not UserStats.objects.filter(
+            user_id=author_id, followers_count=fanout_limit()).exists():
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    for user_id in follower_ids:
+        backfill(user_id, author_id)
+
+
+def prune(user_id, author_id):
+    """Убирает посты автора из ленты отписавшегося пользователя."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def is_heavy(author_id):
+    return UserStats.objects.filter(
+        user_id=author_id, followers_count__gt=fanout_limit()).exists()
+
+
+def heavy_followees(user):
+    """Авторы из подписок пользователя, чьи посты не раскладываются."""
+    return list(
+        UserStats.objects
+        .filter(
+            user__following__user=user,
+            followers_count__gt=fanout_limit(),
+        )
+        .values_list('user_id', flat=True)
+    )
+
+
+def entries(user):
+    """Строки ленты пользователя в её порядке; посты берутся из них без
+    отдельных запросов, а сортировка идёт по индексу ленты, а не по
+    posts_post после соединения."""
+    return TimelineEntry.objects.filter(user=user).select_related(
+        'post__author', 'post__group').order_by(*ORDERING)
+
+
+def posts_of(rows):
+    return [row.post for row in rows]
+
+
+def mixed_feed(user, heavy):
+    """Лента с постами авторов `heavy`, которые не раскладываются."""
+    timeline = TimelineEntry.objects.filter(user=user).values('post')
+    return Post.objects.filter(Q(pk__in=timeline) | Q(author_id__in=heavy))
@@ -1,33 +1,49 @@
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404
-from .models import Post, Group, User, Comment, Follow
-from django.core.paginator import Paginator
+from django.urls import reverse
+from django.utils.http import urlencode
+from .models import Post, Group, User, Comment, Follow, Tag
 from django.shortcuts import redirect
 from .forms import PostForm, CommentForm
+from .paginators import CursorPaginator, get_cursor_page, get_page
+from . import (autocomplete, caching, comment_buffer, counters, follow_graph,
+               search, tags, threads, thumbnails, timeline)
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.db import IntegrityError, transaction
 
 POSTS_ON_PAGE = 10
+COMMENTS_ON_PAGE = 20
+CACHE_TIMEOUT = 60 * 60 * 6
 
 
-@cache_page(60 * 20)
+def schedule_thumbnails(post):
+    """Миниатюры новой картинки создаются в фоне после коммита."""
+    if post.image:
+        transaction.on_commit(lambda: thumbnails.schedule(post))
+
+
+@caching.cache_page_by_scopes(
+    CACHE_TIMEOUT, lambda: [caching.index_scope()])
 def index(request):
-    post_list = Post.objects.all().order_by('-pub_date')
-    paginator = Paginator(post_list, POSTS_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.select_related(
+        'author', 'group').order_by('-pub_date', '-id')
+    page_obj = get_page(request, post_list, POSTS_ON_PAGE)
+    thumbnails.prefetch(page_obj)
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+@caching.cache_page_by_scopes(
+    CACHE_TIMEOUT, lambda slug: [caching.group_scope(slug)])
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     post_list = Post.objects.filter(
-        group=group).order_by('-pub_date')
-    paginator = Paginator(post_list, POSTS_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+        group=group).select_related(
+        'author', 'group').order_by('-pub_date', '-id')
+    page_obj = get_page(request, post_list, POSTS_ON_PAGE)
+    thumbnails.prefetch(page_obj)
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -35,18 +51,20 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@caching.cache_page_by_scopes(
+    CACHE_TIMEOUT, lambda username: [caching.profile_scope(username)])
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
     post_list = Post.objects.filter(
-        author=author).order_by('-pub_date')
-    paginator = Paginator(post_list, POSTS_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    post_count = post_list.count()
+        author=author).select_related(
+        'author', 'group').order_by('-pub_date', '-id')
+    page_obj = get_page(request, post_list, POSTS_ON_PAGE)
+    thumbnails.prefetch(page_obj)
+    post_count = counters.stats_for(author).posts_count
     following = None
     if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user, author=author).exists()
+        following = follow_graph.follows(request.user, author.pk)
     context = {
         'author': author,
         'page_obj': page_obj,
@@ -56,26 +74,130 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
-@cache_page(60 * 20)
+def get_comments(request, post_id):
+    """Комментарии поста или только ветка `?thread=` (не глубже
+    `?depth=` уровней ответов) и параметры, которые это задают."""
+    comments = Comment.objects.filter(post_id=post_id)
+    thread_id = request.GET.get('thread', '')
+    thread = None
+    if thread_id.isdigit():
+        thread = comments.filter(pk=thread_id).first()
+    if thread is None:
+        return comments, {}
+    params = {'thread': thread.pk}
+    depth = request.GET.get('depth', '')
+    if depth.isdigit():
+        params['depth'] = int(depth)
+    return threads.subtree(thread, params.get('depth')), params
+
+
+def get_comments_page(request, comments):
+    """Порция комментариев в порядке веток: первая, по курсору
+    `?after=`/`?before=` или начиная с комментария `?comment=`."""
+    paginator = CursorPaginator(
+        comments.select_related('author'), COMMENTS_ON_PAGE,
+        ordering=('path',))
+    comment_id = request.GET.get('comment', '')
+    if comment_id.isdigit():
+        comment = comments.filter(pk=comment_id).first()
+        if comment is not None:
+            return paginator.page_from(comment)
+    return get_cursor_page(request, paginator)
+
+
+def comments_context(request, post_id):
+    comments, params = get_comments(request, post_id)
+    return {
+        'comments': get_comments_page(request, comments),
+        'thread': params.get('thread'),
+        # Ссылки на следующие порции сохраняют ветку и глубину
+        'comments_query': urlencode(params) + '&' if params else '',
+    }
+
+
+@caching.cache_page_by_scopes(
+    CACHE_TIMEOUT, lambda post_id: [caching.post_scope(post_id)])
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    author = post.author
-    post_list = Post.objects.filter(
-        author=author)
-    post_count = post_list.count()
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id)
+    post_count = counters.stats_for(post.author).posts_count
     title = post.text[:30]
     form = CommentForm()
-    comments = Comment.objects.filter(post=post)
     context = {
         'post': post,
         'title': title,
         'post_count': post_count,
         'form': form,
-        'comments': comments,
+        **comments_context(request, post.pk),
+        'pending_comments': comment_buffer.pending(post.pk, request.user),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@caching.cache_page_by_scopes(
+    CACHE_TIMEOUT, lambda post_id: [caching.post_scope(post_id)])
+def post_comments(request, post_id):
+    """Следующая порция комментариев — фрагмент HTML для post_detail."""
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    context = {
+        'post': post,
+        **comments_context(request, post.pk),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+def tag_posts(request, name):
+    tag = get_object_or_404(Tag, name=name.casefold())
+    paginator = CursorPaginator(
+        tags.tagged_rows(tag), POSTS_ON_PAGE,
+        ordering=('-pub_date', '-post_id'), transform=tags.posts_of)
+    page_obj = get_cursor_page(request, paginator)
+    thumbnails.prefetch(page_obj)
+    context = {
+        'tag': tag,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/tag_posts.html', context)
+
+
+def mentions(request, username):
+    author = get_object_or_404(User, username=username)
+    paginator = CursorPaginator(
+        tags.mention_rows(author), POSTS_ON_PAGE,
+        ordering=('-pub_date', '-post_id'), transform=tags.posts_of)
+    page_obj = get_cursor_page(request, paginator)
+    thumbnails.prefetch(page_obj)
+    context = {
+        'author': author,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/mentions.html', context)
+
+
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    results = search.SearchResults(query)
+    page_obj = search.SearchPaginator(results, POSTS_ON_PAGE).get_page(
+        request.GET.get('page'))
+    thumbnails.prefetch(page_obj)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        # Ссылки пагинатора сохраняют запрос
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def suggest(request):
+    try:
+        limit = int(request.GET.get('limit', 10))
+    except ValueError:
+        limit = 10
+    results = autocomplete.suggest(request.GET.get('q', ''), max(limit, 1))
+    return JsonResponse({'results': results})
+
+
 @login_required
 def post_create(request):
     if request.method == "POST":
@@ -84,6 +206,7 @@ def post_create(request):
             post = form.save(commit=False)
             post.author = request.user
             post.save()
+            schedule_thumbnails(post)
             return redirect('posts:profile', username=request.user.username)
         return render(request, 'posts/post_create.html', {'form': form})
     else:
@@ -103,7 +226,9 @@ def post_edit(request, post_id):
             instance=post
         )
         if form.is_valid():
-            form.save()
+            post = form.save()
+            if 'image' in form.changed_data:
+                schedule_thumbnails(post)
             return redirect('posts:post_detail', post_id)
         return render(
             request,
@@ -121,29 +246,68 @@ def post_edit(request, post_id):
     )
 
 
+def get_reply_parent(request, post_id):
+    """Комментарий, на который отвечают (`parent` в POST), или None."""
+    parent_id = request.POST.get('parent', '')
+    if not parent_id.isdigit():
+        return None
+    parent = Comment.objects.filter(
+        post_id=post_id, pk=parent_id).select_related('parent').first()
+    return threads.reply_parent(parent)
+
+
+def add_buffered_comment(request, post_id):
+    """add_comment в режиме COMMENT_BUFFER: комментарий уходит в
+    очередь, пост не читается (комментарии к удалённым постам
+    отбрасываются при записи)."""
+    url = reverse('posts:post_detail', args=[post_id])
+    response = redirect(f'{url}#comments')
+    form = CommentForm(request.POST or None)
+    if form.is_valid():
+        comment = form.save(commit=False)
+        comment.author = request.user
+        comment.post_id = post_id
+        comment.parent = get_reply_parent(request, post_id)
+        comment_buffer.enqueue(comment)
+        # Новая cookie — новый ключ страниц в кеше только у автора:
+        # он видит свой комментарий, кеш остальных читателей цел
+        response.set_cookie(
+            comment_buffer.COOKIE_NAME, comment.buffer_token,
+            max_age=comment_buffer.PENDING_TIMEOUT, httponly=True)
+    return response
+
+
 @login_required
 def add_comment(request, post_id):
+    if comment_buffer.is_enabled():
+        return add_buffered_comment(request, post_id)
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
+        comment.parent = get_reply_parent(request, post.pk)
         comment.save()
+        # На ту порцию комментариев, где виден новый
+        url = reverse('posts:post_detail', args=[post_id])
+        return redirect(
+            f'{url}?comment={comment.pk}#comment-{comment.pk}')
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-
-    user = request.user
-    authors = user.follower.values_list('author', flat=True)
-    post_list = Post.objects.filter(
-        author__id__in=authors).order_by('-pub_date')
-
-    paginator = Paginator(post_list, POSTS_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    heavy = timeline.heavy_followees(request.user)
+    if heavy:
+        post_list = timeline.mixed_feed(request.user, heavy).select_related(
+            'author', 'group').order_by('-pub_date', '-id')
+        page_obj = get_page(request, post_list, POSTS_ON_PAGE)
+    else:
+        page_obj = get_page(
+            request, timeline.entries(request.user), POSTS_ON_PAGE,
+            ordering=timeline.ORDERING, transform=timeline.posts_of)
+    thumbnails.prefetch(page_obj)
     context = {'page_obj': page_obj}
     return render(request, 'posts/follow.html', context)
 
@@ -151,10 +315,15 @@ def follow_index(request):
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    if request.user != author:
-        obj = Follow.objects.filter(user=request.user, author=author).exists()
-        if obj is False:
-            Follow.objects.create(user=request.user, author=author)
+    # Повторная подписка не доходит до базы
+    if (request.user != author
+            and not follow_graph.follows(request.user, author.pk)):
+        try:
+            with transaction.atomic():
+                Follow.objects.create(user=request.user, author=author)
+        except IntegrityError:
+            # Подписка уже есть: уникальный индекс делает вставку идемпотентной
+            pass
     return redirect('posts:profile', username=username)
 
 
@@ -0,0 +1,15 @@
+"""Точки входа для пула процессов.
+
+Дочерний процесс (spawn) импортирует этот модуль до django.setup(),
+поэтому модели и всё, что их импортирует, загружаются внутри функций.
+"""
+import django
+
+
+def init():
+    django.setup()
+
+
+def regenerate_thumbnails(name, force=False):
+    from posts import thumbnails
+    thumbnails.regenerate(name, force)
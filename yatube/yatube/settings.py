@@ -144,8 +144,69 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Локальный LRU каждого процесса поверх общего кеша. Для нескольких
+# воркеров общий кеш должен быть действительно общим и с атомарными add
+# и incr, например
+# SHARED_CACHE_BACKEND=django.core.cache.backends.memcached.MemcachedCache
+# и SHARED_CACHE_LOCATION=127.0.0.1:11211. FileBasedCache и
+# DatabaseCache не подходят: их incr — чтение и запись без блокировки.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.TwoTierCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 5,
+            'SYNC_INTERVAL': 1,
+            'LOG_SIZE': 10000,
+            'LOG_TIMEOUT': 10,
+        },
+    },
+    'shared': {
+        'BACKEND': os.environ.get(
+            'SHARED_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('SHARED_CACHE_LOCATION', 'yatube-shared'),
+        # Страницы, карточки, версии областей и журнал двухуровневого
+        # кеша (до LOG_SIZE ключей); 300 по умолчанию на это не хватает
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
 }
+
+# Авторы, у которых подписчиков больше этого числа, не рассылают посты
+# в материализованные ленты: их посты подмешиваются при чтении ленты.
+TIMELINE_FANOUT_LIMIT = 10000
+
+# До этого числа записей пагинатор считает их точно, выше — берёт
+# оценку из статистики СУБД или закешированный COUNT(*).
+EXACT_COUNT_LIMIT = 1000
+COUNT_CACHE_TIMEOUT = 60 * 10
+
+# Потоков фоновой генерации миниатюр; 0 — генерировать сразу в запросе.
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 2))
+
+# Буферизованная запись комментариев (posts.comment_buffer): add_comment
+# ставит комментарий в очередь, а фоновый поток вставляет их пачками до
+# COMMENT_BUFFER_BATCH_SIZE, добирая пачку не дольше COMMENT_BUFFER_WAIT
+# секунд. Без COMMENT_BUFFER_WORKER очередь записывает только flush().
+COMMENT_BUFFER = os.environ.get('COMMENT_BUFFER') == '1'
+COMMENT_BUFFER_BATCH_SIZE = 50
+COMMENT_BUFFER_WAIT = 0.05
+COMMENT_BUFFER_WORKER = True
+
+# Отдача MEDIA_URL приложением (core.views.serve_media). Чтобы файлы
+# отдавал веб-сервер, укажите 'x-sendfile' (Apache, lighttpd) или
+# 'x-accel-redirect' (nginx; internal-location с префиксом ниже).
+MEDIA_SENDFILE = os.environ.get('MEDIA_SENDFILE') or None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+# Время кеширования файлов с изменяемыми именами, секунд
+MEDIA_MAX_AGE = 60 * 60
+
+# Загрузки больше этого размера пишутся во временный файл на диске, а не
+# держатся в памяти воркера целиком
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+# Ограничения на картинку поста: размер файла и число пикселей (ширина
+# на высоту) — от него зависит память на декодирование
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40_000_000